@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_seed',
     'rest_framework',
     'rest_framework.authtoken',
@@ -48,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryStatsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -85,14 +89,56 @@ DATABASES = {
     'default': {
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 0)),
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        },
     }
 }
 
+# Connections persist for DB_CONN_MAX_AGE seconds, and are checked with a
+# query before the first use of every request (CONN_HEALTH_CHECKS). A
+# DB_POOL_MAX_SIZE above 0 instead shares a pool of at most that many
+# connections between the threads of each process, returning them at the
+# end of every request and closing those idle for DB_POOL_MAX_IDLE seconds
+# beyond DB_POOL_MIN_SIZE. Requests wait up to DB_POOL_TIMEOUT seconds for
+# a free connection
+
+# Read replicas, as a comma separated DB_REPLICA_HOSTS. Safe requests read
+# from replicas lagging at most REPLICA_MAX_LAG seconds, and clients read
+# from the primary for REPLICA_MAX_LAG seconds after they write
+
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica_%d' % index
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_MAX_LAG = 5
+
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# Under ASGI the async candidate views query through asyncpg pools of
+# ASYNC_DB_POOL_MIN_SIZE to ASYNC_DB_POOL_MAX_SIZE connections per worker
+
+ASYNC_DB_POOL_MIN_SIZE = 1
+
+ASYNC_DB_POOL_MAX_SIZE = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -112,6 +158,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# New passwords are hashed with the PASSWORD_HASHER hasher, argon2 or
+# pbkdf2. Hashes made by the other one still verify, and are replaced at
+# the next login. Argon2 costs ARGON2_TIME_COST passes over
+# ARGON2_MEMORY_COST KiB in ARGON2_PARALLELISM lanes per hash
+
+PASSWORD_HASHERS = [
+    'core.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
+
+if os.environ.get('PASSWORD_HASHER') == 'pbkdf2':
+    PASSWORD_HASHERS.reverse()
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -140,3 +207,52 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 SAFE_DELETE_INTERPRET_UNDELETED_OBJECTS_AS_CREATED = True
+
+# Token authentication cache
+# Resolved tokens are kept in process, and in the TOKEN_AUTH_CACHE_ALIAS
+# cache when set, for TOKEN_AUTH_CACHE_TTL seconds
+
+TOKEN_AUTH_CACHE_TTL = 30
+
+TOKEN_AUTH_CACHE_MAX_SIZE = 10000
+
+TOKEN_AUTH_CACHE_ALIAS = None
+
+# Anonymous candidate responses are cached for CANDIDATE_CACHE_TTL seconds,
+# bounding how stale their vote counts can get
+
+CANDIDATE_CACHE_TTL = 10
+
+# The topics of a user's saved filters are cached until the filters change,
+# for at most FILTER_CACHE_TTL seconds
+
+FILTER_CACHE_TTL = 3600
+
+# Caches of the candidates, locations, taxonomy and saved filters follow
+# changes through generations kept in the GENERATION_CACHE_ALIAS cache.
+# Point it to a cache shared by every process; with a cache in process
+# memory, processes see each other's changes after GENERATION_LOCAL_TTL
+# seconds
+
+GENERATION_CACHE_ALIAS = 'default'
+
+GENERATION_LOCAL_TTL = 60
+
+# Requests running one SQL statement this many times are logged as N+1
+
+QUERY_STATS_N_PLUS_ONE_THRESHOLD = 5
+
+# Responses of writes sent with an Idempotency-Key header are replayed to
+# retries with the same key for IDEMPOTENCY_KEY_TTL seconds
+
+IDEMPOTENCY_KEY_TTL = 86400
+
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+
+# In write-behind mode created votes are queued, answered with 202 and
+# saved in batches by the drain_votes command. Votes are refused with 503
+# while VOTE_QUEUE_MAX_PENDING votes are waiting
+
+VOTE_WRITE_BEHIND = False
+
+VOTE_QUEUE_MAX_PENDING = 100000
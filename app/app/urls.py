@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import RequestStatsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('app_user.urls')),
     path('api/vote/', include('app_vote.urls')),
+    path('api/stats/', RequestStatsView.as_view(), name='stats'),
 ]
@@ -0,0 +1,25 @@
+"""URL configuration of the ASGI application
+
+Candidate reads are served by the async views of app_vote.async_views,
+which hand everything else to the viewsets. Signups and logins run off
+the thread of the sync views, see app_user.async_views. All other URLs
+are those of app.urls.
+"""
+from django.urls import path
+
+from app import urls
+from app_user import async_views as user_async_views
+from app_vote import async_views
+
+urlpatterns = [
+    path('api/vote/candidate/', async_views.candidate_list,
+         name='async-candidate-list'),
+    path('api/vote/candidate/<int:pk>/', async_views.candidate_detail,
+         name='async-candidate-detail'),
+    path('api/vote/candidate/<int:pk>/tally/', async_views.candidate_tally,
+         name='async-candidate-tally'),
+    path('api/user/create/', user_async_views.create_user,
+         name='async-user-create'),
+    path('api/user/token/', user_async_views.create_token,
+         name='async-user-token'),
+] + urls.urlpatterns
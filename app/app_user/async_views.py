@@ -0,0 +1,32 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from app_user import views
+
+
+def off_thread(view):
+    """Run a sync view in the default executor, instead of the one thread
+    the ASGI handler runs all sync code in
+
+    Signups and logins spend most of their time hashing passwords, which
+    would hold every other sync request up. request_started and
+    request_finished only close the old connections of the handler's
+    thread, so the view closes those of its own.
+    """
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+    run = sync_to_async(run, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    async_view.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return async_view
+
+
+create_user = off_thread(views.CreateUserView.as_view())
+create_token = off_thread(views.CreateTokenView.as_view())
@@ -1,5 +1,12 @@
-from django.test import TestCase
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase, \
+    override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework.authtoken.models import Token
 from django.urls import reverse
 
 import json
@@ -7,6 +14,8 @@ import json
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from app_user.serializers import AuthTokenSerializer
+
 CREATE_USER_URL = reverse('app_user:create')
 TOKEN_URL = reverse('app_user:token')
 ME_URL = reverse('app_user:me')
@@ -176,3 +185,57 @@ class PrivateUserApiTests(TestCase):
             TOKEN_URL, payload).data.get('token')
         res = self.client.post(ME_LOGOUT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch('app_user.views.invalidate_token')
+    def test_logout_invalidates_deleted_token(self, invalidate_token):
+        """Test the cached token is dropped after it is deleted"""
+        key = Token.objects.create(user=self.user).key
+        invalidate_token.side_effect = lambda key: self.assertFalse(
+            Token.objects.filter(key=key).exists())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            res = self.client.post(ME_LOGOUT_URL)
+            invalidate_token.assert_not_called()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(callbacks), 1)
+        invalidate_token.assert_called_once_with(key)
+
+
+@override_settings(ROOT_URLCONF='app.urls_asgi')
+class AsyncUserApiTests(TransactionTestCase):
+    """Test signups and logins served under ASGI"""
+
+    def setUp(self):
+        # Closes the connections of the executor threads after each view,
+        # which would otherwise keep the test database open
+        conn_max_age = patch.dict(connection.settings_dict, CONN_MAX_AGE=0)
+        conn_max_age.start()
+        self.addCleanup(conn_max_age.stop)
+
+    async def test_login_runs_off_sync_thread(self):
+        """Test logins authenticate outside the thread of the sync views"""
+        sync_thread = await sync_to_async(threading.get_ident)()
+        threads = []
+        validate = AuthTokenSerializer.validate
+
+        def record_thread(serializer, attrs):
+            threads.append(threading.get_ident())
+            return validate(serializer, attrs)
+
+        client = AsyncClient()
+        res = await client.post(CREATE_USER_URL, {
+            'email': 'test@example.com', 'name': 'Test name',
+            'password': 'test123', 'password_confirmation': 'test123'},
+            content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with patch.object(AuthTokenSerializer, 'validate', record_thread):
+            res = await client.post(TOKEN_URL, {
+                'email': 'test@example.com', 'password': 'test123'},
+                content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.json())
+        self.assertNotEqual(threads, [])
+        self.assertNotIn(sync_thread, threads)
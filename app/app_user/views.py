@@ -1,8 +1,13 @@
 # from django.shortcuts import render
-from rest_framework import status, views, generics, authentication, permissions
+from functools import partial
+
+from django.db import transaction
+from rest_framework import status, views, generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from app_user.serializers import UserSerializer, AuthTokenSerializer
+from core.authentication import CachedTokenAuthentication, \
+    invalidate_token, invalidate_user
 from rest_framework.response import Response
 
 
@@ -22,7 +27,7 @@ class CreateTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     # http_method_names = ['get', 'patch', 'head', 'options']
 
@@ -30,14 +35,23 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         """Retrieve and return authenticated user"""
         return self.request.user
 
+    def perform_update(self, serializer):
+        """Update the user and drop its cached tokens once saved"""
+        user = serializer.save()
+        transaction.on_commit(partial(invalidate_user, user))
+
 
 class UserLogout(views.APIView):
     """Manage the user logout"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request):
         """Retrieve and return successive logout user"""
+        key = request.user.auth_token.key
         request.user.auth_token.delete()
+        # Dropped after the delete commits, so a concurrent request cannot
+        # cache the token again
+        transaction.on_commit(partial(invalidate_token, key))
         return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,132 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from app_vote import serializers
+from app_vote.caching import cache_response, cached_response, \
+    response_cache_key
+from app_vote.filters import filter_candidates
+from app_vote.pagination import KeysetPagination
+from app_vote.views import CandidateViewSet
+from core.asyncdb import fetch_values
+from core.authentication import cached_user
+from core.cache import candidate_generation
+from core.models import Candidate
+
+# Requests with any other query parameter, like search or country, need
+# synchronous lookups and are answered by the viewset
+ASYNC_PARAMS = frozenset((
+    'cursor', 'page_size', 'topic', 'sub_category', 'category', 'city',
+    'state'))
+
+renderer = JSONRenderer()
+
+
+def accepts_json(request):
+    """Return whether the viewset would render JSON for request"""
+    accept = request.META.get('HTTP_ACCEPT', '*/*')
+    return 'text/html' not in accept and (
+        '*/*' in accept or renderer.media_type in accept)
+
+
+def get_token_user(request):
+    """Return the user of the request's token when this process has it
+    cached, False for anonymous requests, or None when the token has to be
+    checked by the viewset"""
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'token':
+        return False
+    if len(auth) != 2:
+        return None
+    try:
+        return cached_user(auth[1].decode())
+    except UnicodeError:
+        return None
+
+
+def async_read(actions, cached=False):
+    """Serve the GET requests of a CandidateViewSet route with the decorated
+    coroutine, without holding a thread while the database answers
+
+    The coroutine returns the response data, or None to hand the request
+    to the viewset, which also gets every other method, requests whose
+    token is not cached yet and requests the coroutine does not support.
+    With cached, anonymous responses share the viewset's response cache.
+    """
+    viewset = sync_to_async(CandidateViewSet.as_view(actions))
+
+    def decorator(read):
+        @functools.wraps(read)
+        async def view(request, **kwargs):
+            user = None
+            if request.method == 'GET' and accepts_json(request) and \
+                    ASYNC_PARAMS.issuperset(request.GET):
+                user = get_token_user(request)
+            if user is None:
+                return await viewset(request, **kwargs)
+
+            key = None
+            if cached and user is False:
+                key = response_cache_key(
+                    request, renderer.format, candidate_generation.get())
+                response = cached_response(request, key)
+                if response is not None:
+                    return response
+
+            try:
+                data = await read(request, **kwargs)
+            except (APIException, TypeError, ValueError):
+                data = None
+            if data is None:
+                return await viewset(request, **kwargs)
+
+            response = HttpResponse(
+                renderer.render(data), content_type=renderer.media_type)
+            response['Vary'] = 'Accept'
+            if key is None:
+                return response
+            return cache_response(
+                request, key, response, CandidateViewSet.cache_ttl)
+
+        # The viewset enforces CSRF for session authentication itself
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+@async_read({'get': 'list', 'post': 'create'}, cached=True)
+async def candidate_list(request):
+    """Return a page of candidates"""
+    paginator = KeysetPagination()
+    queryset = serializers.candidate_values.values(
+        filter_candidates(Candidate.objects.all(), request.GET))
+    rows = await fetch_values(
+        paginator.get_page_queryset(queryset, Request(request)))
+    page = paginator.set_page(rows)
+    return paginator.get_paginated_response(
+        serializers.candidate_values.many(page)).data
+
+
+@async_read({'get': 'retrieve', 'put': 'update',
+             'patch': 'partial_update', 'delete': 'destroy'}, cached=True)
+async def candidate_detail(request, pk):
+    """Return a candidate, or None when it does not exist"""
+    rows = await fetch_values(serializers.candidate_values.values(
+        filter_candidates(Candidate.objects.filter(pk=pk), request.GET)))
+    if rows:
+        return serializers.candidate_values.to_representation(rows[0])
+
+
+@async_read({'get': 'tally'})
+async def candidate_tally(request, pk):
+    """Return the vote counts of a candidate, or None when it does not
+    exist"""
+    rows = await fetch_values(serializers.tally_values.values(
+        Candidate.objects.filter(pk=pk)))
+    if rows:
+        return serializers.tally_values.to_representation(rows[0])
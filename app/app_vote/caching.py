@@ -0,0 +1,93 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag, urlencode
+
+from core.cache import candidate_generation
+
+
+def response_cache_key(request, renderer_format, generation):
+    """Return the cache key of the response to request rendered in
+    renderer_format from the given generation of the data"""
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw = '%s:%s?%s:%s:%s' % (
+        request.get_host(), request.path, params, renderer_format, generation)
+    return 'response:%s' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(request, etag):
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
+
+
+def cached_response(request, key):
+    """Return the response cached under key, or None"""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    etag, content_type, content = entry
+    if is_not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
+def cache_response(request, key, response, ttl):
+    """Cache the rendered response under key with its ETag, and return it or
+    304 when the client has it already"""
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    cache.set(key, (etag, response['Content-Type'], response.content), ttl)
+    response['ETag'] = etag
+    if is_not_modified(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    return response
+
+
+class CachedReadMixin:
+    """Serve anonymous list and retrieve responses from the cache
+
+    Rendered responses are cached by host, path, sorted query parameters,
+    renderer and the generation of the data, so bumping the generation
+    drops every cached response. Each entry carries an ETag that is
+    answered with 304 when it matches ``If-None-Match``.
+    """
+    cache_generation = candidate_generation
+    cache_ttl = getattr(settings, 'CANDIDATE_CACHE_TTL', 10)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_read(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_read(super().retrieve, request, *args, **kwargs)
+
+    def cached_read(self, handler, request, *args, **kwargs):
+        """Return the cached response of handler or compute and cache it"""
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        response = cached_response(request, key)
+        if response is None:
+            self.cache_key = key
+            return handler(request, *args, **kwargs)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        key = getattr(self, 'cache_key', None)
+        if key is None or response.status_code != 200:
+            return response
+
+        response.render()
+        return cache_response(request, key, response, self.cache_ttl)
+
+    def get_cache_key(self, request):
+        return response_cache_key(
+            request, request.accepted_renderer.format,
+            self.cache_generation.get())
@@ -0,0 +1,160 @@
+import functools
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    TrigramSimilarity
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Exists, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from core.cache import filter_generation
+from core.hierarchy import location_tree
+from core.models import CandidateTopic, City, Filter
+
+
+def _topics(field):
+    def lookup(ids):
+        return Exists(CandidateTopic.objects.filter(
+            candidate=OuterRef('pk'), **{field + '__in': ids}))
+    return lookup
+
+
+def _cities_in_states(ids):
+    return Exists(City.objects.filter(
+        pk=OuterRef('city_id'), state_id__in=ids))
+
+
+def _states_in_countries(ids):
+    tree = location_tree()
+    return _cities_in_states([
+        state_id for country_id in ids
+        for state_id in tree.states_in_country(country_id)])
+
+
+CANDIDATE_FILTERS = {
+    'topic': _topics('topic_id'),
+    'sub_category': _topics('sub_category_id'),
+    'category': _topics('category_id'),
+    'city': lambda ids: Q(city_id__in=ids),
+    'state': _cities_in_states,
+    'country': _states_in_countries,
+}
+
+
+def parse_ids(params, name):
+    """Return the comma separated ids of the name query parameter"""
+    try:
+        return [int(id) for value in params.getlist(name)
+                for id in value.split(',') if id]
+    except ValueError:
+        raise ValidationError(
+            {name: _('Expected a comma separated list of ids.')})
+
+
+def filter_candidates(queryset, params):
+    """Filter candidates by the topic, category and location params
+
+    Every parameter takes a comma separated list of ids, matching any of
+    them, and the parameters are combined with AND. Taxonomy filters are
+    EXISTS lookups on the denormalized ``CandidateTopic`` columns and
+    state and country filters EXISTS lookups on ``City``, with countries
+    expanded to their states from the cached location tree.
+    """
+    for name, lookup in CANDIDATE_FILTERS.items():
+        if name in params:
+            queryset = queryset.filter(lookup(parse_ids(params, name)))
+    return queryset
+
+
+def filter_topic_ids(user):
+    """Return the topic ids of the active saved filters of user
+
+    The ids are cached per user until one of the user's filters changes,
+    as seen through the filter generation of the user.
+    """
+    key = 'filters:%d:%s' % (user.pk, filter_generation(user.pk).get())
+    topic_ids = cache.get(key)
+    if topic_ids is None:
+        topic_ids = sorted(set(Filter.objects.filter(
+            user=user, is_active=True).values_list('topic_id', flat=True)))
+        cache.set(key, topic_ids,
+                  getattr(settings, 'FILTER_CACHE_TTL', 3600))
+    return topic_ids
+
+
+class CandidateFilterBackend(BaseFilterBackend):
+    """Filter candidates with the query parameters of filter_candidates,
+    and by the topics of the user's saved filters with ``use_filters=1``"""
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = filter_candidates(queryset, request.query_params)
+        if not int(request.query_params.get('use_filters', 0)):
+            return queryset
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+
+        topic_ids = filter_topic_ids(request.user)
+        if topic_ids:
+            queryset = queryset.filter(
+                CANDIDATE_FILTERS['topic'](topic_ids))
+        return queryset
+
+
+SEARCH_CONFIG = 'simple'
+WORD = re.compile(r'\w+')
+
+
+@functools.lru_cache(maxsize=None)
+def trigram_available(alias):
+    """Return whether the pg_trgm extension is installed in database alias"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_candidates(queryset, terms):
+    """Return the candidates matching terms annotated with their ``rank``
+
+    Every word of terms must prefix a word of the name or the description,
+    ranking name matches first. When nothing matches and pg_trgm is
+    installed, names similar to terms are returned instead, ranked by
+    similarity, so misspelled searches still find candidates.
+    """
+    query = SearchQuery(
+        ' & '.join('%s:*' % word for word in WORD.findall(terms)),
+        config=SEARCH_CONFIG, search_type='raw')
+    matches = queryset.filter(search_vector=query)
+    if matches.exists() or not trigram_available(queryset.db):
+        return matches.annotate(rank=Cast(
+            SearchRank(F('search_vector'), query), FloatField()))
+
+    return queryset.filter(name__trigram_similar=terms).annotate(
+        rank=Cast(TrigramSimilarity('name', terms), FloatField()))
+
+
+class CandidateSearchBackend(BaseFilterBackend):
+    """Full-text search of candidates with the ``search`` query parameter,
+    ordering the results by rank"""
+    search_param = 'search'
+    ordering = ('-rank', '-id')
+
+    def get_terms(self, request):
+        terms = request.query_params.get(self.search_param, '')
+        return terms if WORD.search(terms) else None
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_terms(request)
+        if terms is None:
+            return queryset
+        return search_candidates(queryset, terms)
+
+    def get_ordering(self, request, queryset, view):
+        """Return the keyset ordering of the search results"""
+        if self.get_terms(request) is not None:
+            return self.ordering
+        return None
@@ -0,0 +1,208 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, F, Func, Q, Value
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RowComparison(Func):
+    """Comparison of two rows of expressions, like ``(a, b) < (x, y)``,
+    which Postgres answers with a range scan of an index on (a, b)"""
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+    def __init__(self, lhs, operator, rhs):
+        self.arg_joiner = ' %s ' % operator
+        super().__init__(Func(*lhs, function='ROW'),
+                         Func(*rhs, function='ROW'))
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on every field of the ordering
+
+    The opaque cursor carries the values of all ``ordering`` fields of the
+    row at the page boundary, so every page is a single index range scan
+    instead of an OFFSET. The last ordering field must be unique and no
+    ordering field may be null.
+    """
+    ordering = ('-name', '-id')
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(
+            list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Return the queryset of the requested page, plus one row telling
+        whether there is a page after it"""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.position, self.reverse = self.decode_cursor(request)
+        if self.position is not None:
+            self.position = self.get_position(queryset, self.position)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self._seek(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, page):
+        """Return the page out of the rows of get_page_queryset"""
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if self.reverse:
+            page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        self.page = page
+        return page
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering of a filter backend ordering the results,
+        like a search ranking them, or the default ordering"""
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return ordering
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, row, reverse):
+        """Return the url of the page next to the given boundary row"""
+        values = [self._value(row, field.lstrip('-'))
+                  for field in self.ordering]
+        payload = json.dumps([values, reverse], default=str)
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """Return the boundary position and direction of the request"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = urlsafe_b64decode(encoded.encode('ascii'))
+            values, reverse = json.loads(payload.decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or \
+                len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values, bool(reverse)
+
+    def get_position(self, queryset, values):
+        """Return the values of a cursor converted by the fields of the
+        ordering"""
+        position = []
+        for field, value in zip(self.ordering, values):
+            try:
+                value = self._field(queryset, field.lstrip('-')).to_python(
+                    value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _field(queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def _value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return row.serializable_value(name)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def _seek(ordering, position):
+        """Return the filter selecting rows after position in ordering"""
+        names = [field.lstrip('-') for field in ordering]
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) == 1:
+            return RowComparison(
+                [F(name) for name in names], '<' if descending.pop() else '>',
+                [Value(value) for value in position])
+
+        # Mixed directions have no row comparison; the redundant bound on
+        # the first field still starts the index scan at the position
+        first = ordering[0]
+        seek = Q(**{'%s__%s' % (names[0], 'lte' if first.startswith('-')
+                                else 'gte'): position[0]})
+        keys = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = '%s__%s' % (name, 'lt' if field.startswith('-') else 'gt')
+            step = Q(**{lookup: position[index]})
+            for prefix, value in zip(ordering[:index], position):
+                step &= Q(**{prefix.lstrip('-'): value})
+            keys |= step
+        return seek & keys
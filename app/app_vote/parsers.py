@@ -0,0 +1,21 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline delimited JSON into a list of objects"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            lines = codecs.getreader(encoding)(stream)
+            return [json.loads(line) for line in lines if line.strip()]
+        except ValueError as exc:
+            raise ParseError('NDJSON parse error - %s' % str(exc))
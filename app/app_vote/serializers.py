@@ -1,8 +1,139 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
 
 from core.models import Favorite, Candidate, Vote
 
 
+def primary_key(data):
+    """Return data as an integer primary key, or None when it is not one,
+    like booleans and fractional numbers"""
+    if isinstance(data, bool) or \
+            isinstance(data, float) and not data.is_integer():
+        return None
+    try:
+        return int(data)
+    except (TypeError, ValueError):
+        return None
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field resolving instances prefetched into the context
+
+    The context may hold ``prefetched``, a mapping of model to the
+    ``in_bulk`` result of the objects referenced by the payload, so a batch
+    of items does not query once per item.
+    """
+
+    def to_internal_value(self, data):
+        pk = primary_key(data)
+        if pk is None and isinstance(data, (bool, float)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        prefetched = self.context.get('prefetched', {}).get(
+            self.get_queryset().model, {})
+        if pk in prefetched:
+            return prefetched[pk]
+        return super().to_internal_value(data)
+
+
+class RelatedCountField(serializers.IntegerField):
+    """Count read through a relation, falling back to the default when the
+    related object does not exist"""
+
+    def get_attribute(self, instance):
+        value = super().get_attribute(instance)
+        return self.default if value is None else value
+
+
+class ValuesSerializer:
+    """Read-only renderer of ``.values()`` rows for a ModelSerializer
+
+    The plan of the serializer's readable fields is compiled once, so
+    list responses skip model instantiation and per-field attribute
+    lookups while producing the same output as the serializer.
+    """
+    passthrough_fields = (serializers.IntegerField, serializers.CharField,
+                          serializers.BooleanField,
+                          serializers.PrimaryKeyRelatedField)
+    converted_fields = (serializers.DateTimeField, serializers.DateField)
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def plan(self):
+        plan = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, self.passthrough_fields):
+                convert = None
+            elif isinstance(field, self.converted_fields):
+                convert = field
+            else:
+                raise TypeError('Field %s is not supported' % name)
+            default = None
+            if '.' in field.source and field.default is not empty:
+                default = field.default
+            plan.append((name, field.source.replace('.', '__'),
+                         convert, default))
+        return plan
+
+    def values(self, queryset):
+        """Return the queryset fetching the rows needed by the plan, and
+        the annotations of queryset"""
+        return queryset.values(*[lookup for _, lookup, _, _ in self.plan],
+                               *queryset.query.annotations)
+
+    def many(self, rows):
+        # Resolved per call as the current timezone may change per request
+        plan = [(name, lookup, convert and self.converter(convert), default)
+                for name, lookup, convert, default in self.plan]
+        return [self._represent(row, plan) for row in rows]
+
+    def to_representation(self, row):
+        return self.many([row])[0]
+
+    @staticmethod
+    def _represent(row, plan):
+        ret = OrderedDict()
+        for name, lookup, convert, default in plan:
+            value = row[lookup]
+            if value is None:
+                ret[name] = default
+            elif convert is None:
+                ret[name] = value
+            else:
+                ret[name] = convert(value)
+        return ret
+
+    @staticmethod
+    def converter(field):
+        """Return a to_representation of field resolving settings once"""
+        if not isinstance(field, serializers.DateTimeField):
+            return field.to_representation
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = getattr(field, 'timezone', field.default_timezone())
+        if output_format is None or field_timezone is None or \
+                output_format.lower() != ISO_8601:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        return convert
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Serializer for favorite objects"""
 
@@ -13,21 +144,73 @@ class FavoriteSerializer(serializers.ModelSerializer):
                             'deleted', 'is_active', 'user')
 
 
+class VoteListSerializer(serializers.ListSerializer):
+    """Serializer for batches of vote objects"""
+    batch_size = 500
+
+    def create(self, validated_data):
+        """Upsert the votes in batches, returning the saved vote of every
+        item"""
+        votes = [Vote(**attrs) for attrs in validated_data]
+        saved = {}
+        with transaction.atomic():
+            for start in range(0, len(votes), self.batch_size):
+                for vote in Vote.upsert(votes[start:start + self.batch_size]):
+                    saved[vote.user_id, vote.candidate_id] = vote
+
+        return [saved[vote.user_id, vote.candidate_id] for vote in votes]
+
+
 class VoteSerializer(serializers.ModelSerializer):
     """Serializer for vote objects"""
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
 
     class Meta:
         model = Vote
+        list_serializer_class = VoteListSerializer
         fields = '__all__'
         read_only_fields = ('id', 'created', 'modified',
                             'deleted', 'is_active', 'user')
 
+    def create(self, validated_data):
+        """Upsert the vote of the user for the candidate"""
+        return Vote.upsert([Vote(**validated_data)])[0]
+
 
 class CandidateSerializer(serializers.ModelSerializer):
     """Serializer for candidate objects"""
+    up_count = RelatedCountField(
+        source='tally.up_count', read_only=True, default=0)
+    down_count = RelatedCountField(
+        source='tally.down_count', read_only=True, default=0)
 
     class Meta:
         model = Candidate
-        fields = '__all__'
+        exclude = ('search_vector',)
         read_only_fields = ('id', 'created', 'modified',
                             'deleted', 'is_active')
+
+
+class CandidateTallySerializer(serializers.ModelSerializer):
+    """Serializer for the vote counts of a candidate"""
+    up_count = RelatedCountField(
+        source='tally.up_count', read_only=True, default=0)
+    down_count = RelatedCountField(
+        source='tally.down_count', read_only=True, default=0)
+
+    class Meta:
+        model = Candidate
+        fields = ('id', 'up_count', 'down_count')
+        read_only_fields = ('id',)
+
+
+class CandidateIdsSerializer(serializers.Serializer):
+    """Serializer for the ids of a batch of candidates"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+
+candidate_values = ValuesSerializer(CandidateSerializer)
+tally_values = ValuesSerializer(CandidateTallySerializer)
+vote_values = ValuesSerializer(VoteSerializer)
+favorite_values = ValuesSerializer(FavoriteSerializer)
@@ -0,0 +1,203 @@
+import base64
+import functools
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app_vote import async_views
+from core import authentication
+from core.asyncdb import close_pools, to_asyncpg
+from core.models import Candidate, CandidateTally
+
+CANDIDATE_URL = reverse('app_vote:candidate-list')
+
+
+def detail_url(candidate_id):
+    return reverse('app_vote:candidate-detail', args=[candidate_id])
+
+
+def tally_url(candidate_id):
+    return reverse('app_vote:candidate-tally', args=[candidate_id])
+
+
+def with_params(url, **params):
+    # AsyncClient drops the data of GET requests
+    return '%s?%s' % (url, urlencode(params))
+
+
+def viewset_get(url):
+    """GET url from the viewsets, as served under WSGI"""
+    with override_settings(ROOT_URLCONF='app.urls'):
+        return APIClient().get(url)
+
+
+def closing_pools(test):
+    """Close the asyncpg pools of the test's event loop when it ends"""
+    @functools.wraps(test)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await test(*args, **kwargs)
+        finally:
+            await close_pools()
+    return wrapper
+
+
+@override_settings(ROOT_URLCONF='app.urls_asgi')
+class AsyncCandidateViewTests(TransactionTestCase):
+    """Test the async candidate views served under ASGI"""
+
+    def setUp(self):
+        cache.clear()
+        authentication._tokens.clear()
+        self.client = AsyncClient()
+        self.candidate = Candidate.objects.create(
+            name='Candidate 1', description='Description 1')
+        for index in range(2, 5):
+            Candidate.objects.create(name='Candidate %d' % index)
+        CandidateTally.objects.create(
+            candidate=self.candidate, up_count=3, down_count=1)
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.authorization = 'Token %s' % Token.objects.create(
+            user=user).key
+
+        fetch_values = patch.object(
+            async_views, 'fetch_values', wraps=async_views.fetch_values)
+        self.fetch_values = fetch_values.start()
+        self.addCleanup(fetch_values.stop)
+
+    @closing_pools
+    async def test_list_matches_viewset(self):
+        """Test the async list renders like the viewset"""
+        url = with_params(CANDIDATE_URL, page_size=2)
+        expected = await sync_to_async(viewset_get)(url)
+        cache.clear()
+
+        res = await self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected.content)
+        self.assertEqual(self.fetch_values.call_count, 1)
+
+        following = await self.client.get(res.json()['next'])
+
+        self.assertEqual([row['name'] for row in following.json()['results']],
+                         ['Candidate 2', 'Candidate 1'])
+
+    @closing_pools
+    async def test_list_invalid_cursor_values(self):
+        """Test cursors with values unfit for the ordering are not found"""
+        cursor = base64.urlsafe_b64encode(b'[["x", "notanint"], false]')
+
+        res = await self.client.get(
+            with_params(CANDIDATE_URL, cursor=cursor.decode()))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @closing_pools
+    async def test_anonymous_responses_cached(self):
+        """Test anonymous reads share the viewset's response cache"""
+        await sync_to_async(viewset_get)(CANDIDATE_URL)
+
+        res = await self.client.get(CANDIDATE_URL)
+        not_modified = await self.client.get(
+            CANDIDATE_URL, if_none_match=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(not_modified.status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.fetch_values.assert_not_called()
+
+    @closing_pools
+    async def test_uncached_token_checked_by_viewset(self):
+        """Test a token is resolved by the viewset before reads go async"""
+        res = await self.client.get(
+            CANDIDATE_URL, authorization=self.authorization)
+        self.fetch_values.assert_not_called()
+
+        again = await self.client.get(
+            CANDIDATE_URL, authorization=self.authorization)
+
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.content, res.content)
+        self.assertEqual(self.fetch_values.call_count, 1)
+
+        invalid = await self.client.get(
+            CANDIDATE_URL, authorization='Token invalid')
+
+        self.assertEqual(invalid.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @closing_pools
+    async def test_filters_applied(self):
+        """Test the location and taxonomy filters apply to async reads"""
+        res = await self.client.get(with_params(CANDIDATE_URL, city=0))
+
+        self.assertEqual(res.json()['results'], [])
+        self.assertEqual(self.fetch_values.call_count, 1)
+
+    @closing_pools
+    async def test_unsupported_params_served_by_viewset(self):
+        """Test searches and invalid requests are answered by the viewset"""
+        res = await self.client.get(
+            with_params(CANDIDATE_URL, search='candidate'))
+        invalid = await self.client.get(with_params(CANDIDATE_URL, topic='x'))
+
+        self.assertEqual(len(res.json()['results']), 4)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.fetch_values.assert_not_called()
+
+    @closing_pools
+    async def test_retrieve_and_tally(self):
+        """Test retrieving a candidate and its vote counts"""
+        res = await self.client.get(detail_url(self.candidate.id))
+        tally = await self.client.get(tally_url(self.candidate.id))
+        missing = await self.client.get(tally_url(0))
+
+        self.assertEqual(res.json()['name'], 'Candidate 1')
+        self.assertEqual(res.json()['up_count'], 3)
+        self.assertEqual(tally.json(), {
+            'id': self.candidate.id, 'up_count': 3, 'down_count': 1})
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    @closing_pools
+    async def test_writes_served_by_viewset(self):
+        """Test the async routes hand writes to the viewset"""
+        res = await self.client.post(
+            CANDIDATE_URL, {'name': 'Candidate 5'},
+            content_type='application/json',
+            authorization=self.authorization)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.fetch_values.assert_not_called()
+
+    @closing_pools
+    async def test_queries_in_server_timing(self):
+        """Test queries on the async pool are counted per request"""
+        res = await self.client.get(tally_url(self.candidate.id))
+
+        self.assertIn('desc="1 queries"', res['Server-Timing'])
+
+    def test_tally_viewset(self):
+        """Test the viewset returns zero counts for candidates without
+        votes"""
+        candidate = Candidate.objects.create(name='Candidate 5')
+
+        res = viewset_get(tally_url(candidate.id))
+
+        self.assertEqual(res.data, {
+            'id': candidate.id, 'up_count': 0, 'down_count': 0})
+
+    def test_placeholders_numbered(self):
+        """Test the SQL placeholders are converted for asyncpg"""
+        self.assertEqual(
+            to_asyncpg("SELECT %s WHERE name LIKE '100%%' AND id IN (%s)"),
+            "SELECT $1 WHERE name LIKE '100%' AND id IN ($2)")
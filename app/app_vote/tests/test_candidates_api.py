@@ -1,14 +1,19 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from core.models import Candidate
+from core.models import Candidate, Favorite, Vote
 
+import base64
 import json
 
+from app_vote.pagination import KeysetPagination
 from app_vote.serializers import CandidateSerializer
 
 CANDIDATE_URL = reverse('app_vote:candidate-list')
@@ -57,12 +62,92 @@ class PublicCandidatesApiTests(TestCase):
 
         res = self.client.get(CANDIDATE_URL)
 
-        candidates = Candidate.objects.all().order_by('-name')
+        candidates = Candidate.objects.all().order_by('-name', '-id')
 
         serializer = CandidateSerializer(candidates, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_candidates_paginated(self):
+        """Test paging through candidates with ties on name"""
+        for name in ('Candidate 1', 'Candidate 2', 'Candidate 2',
+                     'Candidate 2', 'Candidate 3'):
+            sample_candidate(name=name)
+        expected = list(Candidate.objects.order_by(
+            '-name', '-id').values_list('id', flat=True))
+
+        ids, pages = [], []
+        url = CANDIDATE_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [candidate['id'] for candidate in res.data['results']]
+            pages.append(res.data)
+            url = res.data['next']
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        res = self.client.get(pages[-1]['previous'])
+
+        self.assertEqual(res.data['results'], pages[-2]['results'])
+
+    def test_retrieve_candidates_invalid_cursor(self):
+        """Test retrieving candidates with an invalid cursor fails"""
+        res = self.client.get(CANDIDATE_URL, {'cursor': 'invalid'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_candidates_cursor_invalid_values(self):
+        """Test cursors with values unfit for the ordering fail"""
+        for values in (['x', 'notanint'], [None, None]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([values, False]).encode()).decode()
+
+            res = self.client.get(CANDIDATE_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_candidates_without_distinct(self):
+        """Test listing candidates does not ask for distinct rows"""
+        sample_candidate()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(CANDIDATE_URL)
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('DISTINCT', queries[0]['sql'])
+
+    def test_retrieve_candidates_assigned_only(self):
+        """Test filtering candidates by those with live votes or favorites"""
+        user = get_user_model().objects.create_user(
+            'testpublic@example.com', 'testpublic1234')
+        voted = sample_candidate(name='Voted')
+        favorited = sample_candidate(name='Favorited')
+        unvoted = sample_candidate(name='Unvoted')
+        sample_candidate(name='Untouched')
+        other = get_user_model().objects.create_user(
+            'testother@example.com', 'testother1234')
+        Vote.objects.create(
+            user=user, name='Vote 1', candidate=voted, is_vote=True)
+        Vote.objects.create(
+            user=other, name='Vote 2', candidate=voted, is_vote=False)
+        Vote.objects.create(
+            user=user, name='Vote 3', candidate=unvoted,
+            is_vote=True).delete()
+        Favorite.objects.create(
+            user=user, name='Favorite 1', candidate=favorited)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CANDIDATE_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            [candidate['id'] for candidate in res.data['results']],
+            [voted.id, favorited.id])
+        self.assertNotIn('DISTINCT', queries[0]['sql'])
+        self.assertIn('EXISTS', queries[0]['sql'])
 
     def test_retrieve_candidate(self):
         """Test retrieving candidate"""
@@ -78,6 +163,58 @@ class PublicCandidatesApiTests(TestCase):
 
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_candidate_tally(self):
+        """Test retrieving candidate includes its vote counts"""
+        candidate = sample_candidate()
+        for i, is_vote in enumerate((True, False, False)):
+            user = get_user_model().objects.create_user(
+                'testpublic%d@example.com' % i, 'testpublic1234')
+            Vote.objects.create(user=user, name='Vote %d' % i,
+                                candidate=candidate, is_vote=is_vote)
+
+        res = self.client.get(detail_url_candidate(candidate.id))
+
+        self.assertEqual(res.data['up_count'], 1)
+        self.assertEqual(res.data['down_count'], 2)
+
+    def test_retrieve_candidates_cached(self):
+        """Test repeated anonymous reads are served from the cache"""
+        sample_candidate(name='Candidate 1')
+        res = self.client.get(CANDIDATE_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(CANDIDATE_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_retrieve_candidates_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        sample_candidate(name='Candidate 1')
+        res = self.client.get(CANDIDATE_URL)
+
+        res = self.client.get(CANDIDATE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_retrieve_candidates_cache_invalidated(self):
+        """Test changing a candidate invalidates cached reads"""
+        candidate = sample_candidate(name='Candidate 1')
+        self.client.get(CANDIDATE_URL)
+
+        candidate.name = 'Candidate 2'
+        candidate.save()
+        res = self.client.get(CANDIDATE_URL)
+
+        self.assertEqual(res.data['results'][0]['name'], 'Candidate 2')
+
+        candidate.delete()
+        res = self.client.get(CANDIDATE_URL)
+
+        self.assertEqual(res.data['results'], [])
+
     def test_partial_update_candidate_need_auth(self):
         """Test updating a candidate with patch needs authentication"""
         candidate_name = 'Primary Name'
@@ -186,3 +323,73 @@ class PrivateCandidatesApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertNotIn(candidate, serializer.data)
+
+    def test_bulk_delete_undelete_and_purge(self):
+        """Test soft deleting, undeleting and purging batches"""
+        candidates = [sample_candidate(name='Candidate %d' % i)
+                      for i in range(3)]
+        Vote.objects.create(name='Vote', is_vote=True, user=self.user,
+                            candidate=candidates[0])
+        ids = [candidate.id for candidate in candidates[:2]]
+
+        res = self.client.post(
+            reverse('app_vote:candidate-bulk-delete'), {'ids': ids},
+            format='json')
+
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(Candidate.objects.count(), 1)
+        self.assertFalse(Vote.objects.exists())
+
+        res = self.client.post(
+            reverse('app_vote:candidates-deleted-bulk-undelete'),
+            {'ids': ids[:1]}, format='json')
+
+        self.assertEqual(res.data, {'undeleted': 1})
+        self.assertEqual(Vote.objects.get().candidate, candidates[0])
+
+        res = self.client.post(
+            reverse('app_vote:candidates-deleted-bulk-purge'),
+            {'ids': ids}, format='json')
+
+        self.assertEqual(res.data, {'purged': 1})
+        self.assertEqual(Candidate.objects.all_with_deleted().count(), 2)
+
+    def test_bulk_delete_validates_ids(self):
+        """Test batches need a non-empty list of ids and deleted candidates
+        cannot be created"""
+        res = self.client.post(
+            reverse('app_vote:candidate-bulk-delete'), {'ids': []},
+            format='json')
+        created = self.client.post(CANDIDATES_URL, {'name': 'Candidate'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(created.status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class CandidatePaginationPlanTests(TestCase):
+    """Test deep pages are read from the index without skipping rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Candidate.objects.bulk_create(
+            Candidate(name='Candidate %04d' % (i % 1000))
+            for i in range(5000))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_candidate')
+
+    def test_deep_page_seeks_in_index(self):
+        """Test a page far from the first starts in the name index"""
+        row = Candidate.objects.order_by('-name', '-id').values(
+            'name', 'id')[4000]
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [[row['name'], row['id']], False]).encode()).decode()
+        request = Request(APIRequestFactory().get(
+            CANDIDATE_URL, {'cursor': cursor}, HTTP_HOST='localhost'))
+
+        plan = KeysetPagination().get_page_queryset(
+            Candidate.objects.all(), request).explain(analyze=True)
+
+        self.assertIn('candidate_name_live_idx', plan)
+        self.assertIn('Index Cond', plan)
+        self.assertNotIn('Rows Removed by Filter', plan)
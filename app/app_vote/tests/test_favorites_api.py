@@ -58,12 +58,12 @@ class PrivateFavoritesApiTests(TestCase):
 
         res = self.client.get(FAVORITES_URL)
 
-        favorites = Favorite.objects.all().order_by('-name')
+        favorites = Favorite.objects.all().order_by('-name', '-id')
 
         serializer = FavoriteSerializer(favorites, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_favorite(self):
         """Test retrieving favorite"""
@@ -99,9 +99,9 @@ class PrivateFavoritesApiTests(TestCase):
         res = self.client.get(FAVORITES_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
-        self.assertEqual(res.data[0]['name'], favorite.name)
+        self.assertEqual(res.data['results'][0]['name'], favorite.name)
 
     def test_create_favorite_successful(self):
         """Test creating a new favorite"""
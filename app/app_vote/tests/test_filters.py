@@ -0,0 +1,234 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app_vote.filters import filter_candidates, filter_topic_ids
+from core import models
+from core.benchmark import seed_locations, seed_topics, seed_votes
+
+CANDIDATE_URL = reverse('app_vote:candidate-list')
+
+
+class CandidateFilterApiTests(TestCase):
+    """Test filtering candidates by topic, category and location"""
+
+    def setUp(self):
+        self.client = APIClient()
+        malaysia = models.Country.objects.create(name='Malaysia')
+        singapore = models.Country.objects.create(name='Singapore')
+        self.selangor = models.State.objects.create(
+            name='Selangor', country=malaysia)
+        johor = models.State.objects.create(name='Johor', country=malaysia)
+        central = models.State.objects.create(
+            name='Central', country=singapore)
+        self.klang = models.City.objects.create(
+            name='Klang', state=self.selangor)
+        muar = models.City.objects.create(name='Muar', state=johor)
+        downtown = models.City.objects.create(name='Downtown', state=central)
+
+        politics = models.Category.objects.create(name='Politics')
+        self.elections = models.SubCategory.objects.create(
+            name='Elections', category=politics)
+        trade = models.SubCategory.objects.create(
+            name='Trade', category=models.Category.objects.create(
+                name='Economy'))
+        self.turnout = models.Topic.objects.create(
+            name='Turnout', sub_category=self.elections)
+        self.tariffs = models.Topic.objects.create(
+            name='Tariffs', sub_category=trade)
+
+        self.ahmad = self.sample_candidate('Ahmad', self.klang, self.turnout)
+        self.bakar = self.sample_candidate('Bakar', muar, self.tariffs)
+        self.chong = self.sample_candidate(
+            'Chong', downtown, self.turnout, self.tariffs)
+        self.params = {
+            'topic': self.turnout.id,
+            'sub_category': self.elections.id,
+            'category': politics.id,
+            'city': self.klang.id,
+            'state': self.selangor.id,
+            'country': malaysia.id,
+        }
+
+    @staticmethod
+    def sample_candidate(name, city, *topics):
+        candidate = models.Candidate.objects.create(name=name, city=city)
+        for topic in topics:
+            models.CandidateTopic.objects.create(
+                name=topic.name, candidate=candidate, topic=topic)
+        return candidate
+
+    def get_names(self, params):
+        res = self.client.get(CANDIDATE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(row['name'] for row in res.data['results'])
+
+    def test_filter_by_taxonomy(self):
+        """Test filtering candidates by topic, sub-category and category"""
+        for name in ('topic', 'sub_category', 'category'):
+            self.assertEqual(
+                self.get_names({name: self.params[name]}),
+                ['Ahmad', 'Chong'])
+
+    def test_filter_by_location(self):
+        """Test filtering candidates by city, state and country"""
+        self.assertEqual(self.get_names({'city': self.klang.id}), ['Ahmad'])
+        self.assertEqual(self.get_names({'state': self.selangor.id}),
+                         ['Ahmad'])
+        self.assertEqual(self.get_names({'country': self.params['country']}),
+                         ['Ahmad', 'Bakar'])
+
+    def test_filter_any_of_ids(self):
+        """Test a comma separated list matches any of the ids"""
+        self.assertEqual(
+            self.get_names({'topic': '%d,%d' % (self.turnout.id,
+                                                self.tariffs.id)}),
+            ['Ahmad', 'Bakar', 'Chong'])
+
+    def test_filters_combined(self):
+        """Test filters on different levels must all match"""
+        self.assertEqual(
+            self.get_names({'topic': self.tariffs.id,
+                            'country': self.params['country']}),
+            ['Bakar'])
+
+    def test_filter_ignores_deleted_topics(self):
+        """Test soft deleted candidate topics no longer match"""
+        models.CandidateTopic.objects.filter(
+            candidate=self.chong).delete()
+
+        self.assertEqual(self.get_names({'topic': self.turnout.id}),
+                         ['Ahmad'])
+
+    def test_filter_invalid_ids(self):
+        """Test filtering by anything but ids is rejected"""
+        res = self.client.get(CANDIDATE_URL, {'category': 'politics'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('category', res.data)
+
+
+class SavedFilterApiTests(TestCase):
+    """Test filtering candidates by the user's saved filters"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.client.force_authenticate(self.user)
+        sub_category = models.SubCategory.objects.create(
+            name='Elections',
+            category=models.Category.objects.create(name='Politics'))
+        self.turnout, self.debates, self.polls = (
+            models.Topic.objects.create(name=name, sub_category=sub_category)
+            for name in ('Turnout', 'Debates', 'Polls'))
+        for name, topic in (('Ahmad', self.turnout),
+                            ('Bakar', self.debates),
+                            ('Chong', self.polls)):
+            models.CandidateTopic.objects.create(
+                name=topic.name, topic=topic,
+                candidate=models.Candidate.objects.create(name=name))
+
+    def get_names(self):
+        res = self.client.get(CANDIDATE_URL, {'use_filters': 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(row['name'] for row in res.data['results'])
+
+    def test_use_filters(self):
+        """Test candidates are limited to the topics of active filters"""
+        models.Filter.objects.create(
+            name='Turnout', topic=self.turnout, user=self.user)
+        models.Filter.objects.create(
+            name='Debates', topic=self.debates, user=self.user)
+        models.Filter.objects.create(
+            name='Polls', topic=self.polls, user=self.user, is_active=False)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'test1234')
+        models.Filter.objects.create(
+            name='Polls', topic=self.polls, user=other)
+
+        self.assertEqual(self.get_names(), ['Ahmad', 'Bakar'])
+
+    def test_use_filters_without_filters(self):
+        """Test users without filters see every candidate"""
+        self.assertEqual(self.get_names(), ['Ahmad', 'Bakar', 'Chong'])
+
+    def test_use_filters_requires_auth(self):
+        """Test anonymous users cannot use saved filters"""
+        self.client.force_authenticate(None)
+
+        res = self.client.get(CANDIDATE_URL, {'use_filters': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_filter_topics_cached_until_changed(self):
+        """Test the topics are cached until a filter of the user changes"""
+        saved = models.Filter.objects.create(
+            name='Turnout', topic=self.turnout, user=self.user)
+        self.assertEqual(filter_topic_ids(self.user), [self.turnout.id])
+
+        with self.assertNumQueries(0):
+            filter_topic_ids(self.user)
+
+        saved.topic = self.polls
+        saved.save()
+        self.assertEqual(filter_topic_ids(self.user), [self.polls.id])
+        saved.delete()
+        self.assertEqual(filter_topic_ids(self.user), [])
+
+
+class CandidateFilterPlanTests(TestCase):
+    """Test the filter queries are answered from their indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        city_ids = seed_locations(5, 50, 500)
+        topic_ids = seed_topics(5, 50, 500)
+        seed_votes(100, 5000, 100, city_ids=city_ids, topic_ids=topic_ids)
+        cls.topic = models.Topic.objects.select_related(
+            'sub_category').get(pk=topic_ids[0])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, **params):
+        """Return the query plan of the first filtered candidate page"""
+        queryset = filter_candidates(
+            models.Candidate.objects.order_by('-name', '-id'),
+            QueryDict(urlencode(params)))[:100]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_taxonomy_filters_use_indexes(self):
+        """Test every taxonomy level is an index lookup on candidate
+        topics"""
+        plans = {
+            'ctopic_topic_live_idx': self.explain(topic=self.topic.id),
+            'ctopic_sub_category_live_idx': self.explain(
+                sub_category=self.topic.sub_category_id),
+            'ctopic_category_live_idx': self.explain(
+                category=self.topic.sub_category.category_id),
+        }
+
+        for index, plan in plans.items():
+            self.assertIn(index, plan)
+
+    def test_filters_are_semi_joins(self):
+        """Test filtered candidates need neither joins nor DISTINCT"""
+        query = QueryDict(urlencode({
+            'topic': self.topic.id,
+            'country': models.Country.objects.first().id}))
+        sql = str(filter_candidates(models.Candidate.objects, query).query)
+
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
@@ -0,0 +1,81 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app_vote.filters import trigram_available
+from core.models import Candidate
+
+CANDIDATE_URL = reverse('app_vote:candidate-list')
+
+
+class CandidateSearchApiTests(TestCase):
+    """Test searching candidates"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Candidate.objects.create(
+            name='Ahmad Zaki', description='Former teacher from Klang')
+        Candidate.objects.create(
+            name='Siti Aminah', description='Endorsed by Ahmad Zaki')
+        Candidate.objects.create(
+            name='Chong Wei', description='Runs a bakery in Muar')
+
+    def search(self, terms, **params):
+        res = self.client.get(CANDIDATE_URL, dict(params, search=terms))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def get_names(self, terms):
+        return [row['name'] for row in self.search(terms).data['results']]
+
+    def test_search_by_prefix(self):
+        """Test every word of the search prefixes a candidate word"""
+        self.assertEqual(self.get_names('bak'), ['Chong Wei'])
+        self.assertEqual(self.get_names('chong muar'), ['Chong Wei'])
+        self.assertEqual(self.get_names('chong klang'), [])
+
+    def test_search_ranks_name_first(self):
+        """Test name matches rank above description matches"""
+        self.assertEqual(self.get_names('ahmad'),
+                         ['Ahmad Zaki', 'Siti Aminah'])
+
+    def test_search_ignores_punctuation(self):
+        """Test query syntax in the search is not interpreted"""
+        self.assertEqual(self.get_names("ahmad & !zaki | (teach:*"),
+                         ['Ahmad Zaki'])
+        self.assertEqual(len(self.get_names('&|!')), 3)
+
+    def test_search_follows_updates(self):
+        """Test the search vector is kept current on bulk updates"""
+        Candidate.objects.filter(name='Chong Wei').update(
+            description='Runs a bakery in Penang')
+
+        self.assertEqual(self.get_names('penang'), ['Chong Wei'])
+        self.assertEqual(self.get_names('muar'), [])
+
+    def test_search_excludes_deleted(self):
+        """Test deleted candidates are not found"""
+        Candidate.objects.get(name='Ahmad Zaki').delete()
+
+        self.assertEqual(self.get_names('ahmad'), ['Siti Aminah'])
+
+    def test_search_paginated_by_rank(self):
+        """Test search pages follow the ranking"""
+        res = self.search('ahmad', page_size=1)
+        self.assertEqual(res.data['results'][0]['name'], 'Ahmad Zaki')
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual([row['name'] for row in res.data['results']],
+                         ['Siti Aminah'])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_tolerates_typos(self):
+        """Test misspelled searches fall back to similar names"""
+        # Ask the test database, not one cached before it was created
+        trigram_available.cache_clear()
+        if not trigram_available('default'):
+            self.skipTest('pg_trgm is not installed')
+
+        self.assertEqual(self.get_names('Ahmed Zakki'), ['Ahmad Zaki'])
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Candidate, Favorite, Vote
+
+from app_vote import serializers
+
+
+class ValuesSerializerTests(TestCase):
+    """Test the values serializers render like the model serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'testprivate@example.com',
+            'testprivate1234'
+        )
+        candidate = Candidate.objects.create(
+            name='Candidate 1', description='Description 1')
+        Candidate.objects.create(name='Candidate 2')
+        Candidate.objects.create(name='Candidate 3').delete()
+        Vote.objects.create(
+            user=self.user, name='Vote 2', candidate=candidate,
+            is_vote=False).delete()
+        Vote.objects.create(
+            user=self.user, name='Vote 1', candidate=candidate, is_vote=True)
+        Favorite.objects.create(
+            user=self.user, name='Favorite 1', candidate=candidate)
+
+    def assertRendersLike(self, serializer_class, values, queryset):
+        expected = serializer_class(queryset, many=True).data
+        rows = values.many(values.values(queryset))
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(rows), renderer.render(expected))
+
+    def test_candidate_values(self):
+        """Test candidates render the same, with and without tallies"""
+        queryset = Candidate.objects.all_with_deleted().order_by('id')
+
+        self.assertRendersLike(serializers.CandidateSerializer,
+                               serializers.candidate_values, queryset)
+
+    def test_vote_values(self):
+        """Test votes render the same, including deleted ones"""
+        queryset = Vote.objects.all_with_deleted().order_by('id')
+
+        self.assertRendersLike(serializers.VoteSerializer,
+                               serializers.vote_values, queryset)
+
+    def test_favorite_values(self):
+        """Test favorites render the same"""
+        queryset = Favorite.objects.order_by('id')
+
+        self.assertRendersLike(serializers.FavoriteSerializer,
+                               serializers.favorite_values, queryset)
@@ -1,15 +1,22 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Vote, Candidate
+from core.models import Vote, Candidate, CandidateTally, QueuedVote
 
 from app_vote.serializers import VoteSerializer
 
 VOTES_URL = reverse('app_vote:vote-list')
+VOTES_BULK_URL = reverse('app_vote:vote-bulk')
 
 
 def detail_url(id):
@@ -60,12 +67,36 @@ class PrivateVotesApiTests(TestCase):
 
         res = self.client.get(VOTES_URL)
 
-        votes = Vote.objects.all().order_by('-name')
+        votes = Vote.objects.all().order_by('-name', '-id')
 
         serializer = VoteSerializer(votes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_votes_without_distinct(self):
+        """Test listing votes does not ask for distinct rows"""
+        Vote.objects.create(
+            user=self.user, name='Vote 1',
+            candidate=self.candidate_1, is_vote=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(VOTES_URL)
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('DISTINCT', queries[0]['sql'])
+
+    def test_retrieve_votes_assigned_only(self):
+        """Test filtering votes by assigned candidates"""
+        vote = Vote.objects.create(
+            user=self.user, name='Vote 1',
+            candidate=self.candidate_1, is_vote=True)
+
+        res = self.client.get(VOTES_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [vote['id'] for vote in res.data['results']], [vote.id])
 
     def test_retrieve_vote(self):
         """Test retrieving vote"""
@@ -108,9 +139,9 @@ class PrivateVotesApiTests(TestCase):
         res = self.client.get(VOTES_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
-        self.assertEqual(res.data[0]['name'], vote.name)
+        self.assertEqual(res.data['results'][0]['name'], vote.name)
 
     def test_create_vote_successful(self):
         """Test creating a new vote"""
@@ -128,9 +159,213 @@ class PrivateVotesApiTests(TestCase):
 
         self.assertTrue(exists)
 
+    def test_create_vote_retried(self):
+        """Test posting the same vote again keeps a single vote"""
+        payload = {'name': 'Vote_1_1',
+                   'candidate': self.candidate_1.id, 'is_vote': True}
+        first = self.client.post(VOTES_URL, data=json.dumps(payload),
+                                 content_type='application/json')
+        retry = self.client.post(VOTES_URL, data=json.dumps(payload),
+                                 content_type='application/json')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Vote.objects.count(), 1)
+        tally = CandidateTally.objects.get(candidate=self.candidate_1)
+        self.assertEqual(tally.up_count, 1)
+
+    def test_create_vote_flips_vote(self):
+        """Test posting the opposite vote replaces the live vote"""
+        vote = Vote.objects.create(
+            user=self.user, name='Vote 1',
+            candidate=self.candidate_1, is_vote=True)
+        payload = {'name': 'Vote 2',
+                   'candidate': self.candidate_1.id, 'is_vote': False}
+        res = self.client.post(VOTES_URL, data=json.dumps(payload),
+                               content_type='application/json')
+
+        self.assertEqual(res.data['id'], vote.id)
+        self.assertFalse(res.data['is_vote'])
+        self.assertEqual(Vote.objects.count(), 1)
+        tally = CandidateTally.objects.get(candidate=self.candidate_1)
+        self.assertEqual((tally.up_count, tally.down_count), (0, 1))
+
+    def test_create_votes_bulk_successful(self):
+        """Test creating a batch of votes, later votes for a candidate
+        replacing earlier ones"""
+        payload = [
+            {'name': 'Vote 1', 'candidate': self.candidate_1.id,
+             'is_vote': True},
+            {'name': 'Vote 2', 'candidate': self.candidate_1.id,
+             'is_vote': False},
+            {'name': 'Vote 3', 'candidate': self.candidate_2.id,
+             'is_vote': True},
+        ]
+        res = self.client.post(VOTES_BULK_URL, data=json.dumps(payload),
+                               content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([vote['name'] for vote in res.data],
+                         ['Vote 2', 'Vote 2', 'Vote 3'])
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 2)
+        tally = CandidateTally.objects.get(candidate=self.candidate_1)
+        self.assertEqual(tally.up_count, 0)
+        self.assertEqual(tally.down_count, 1)
+
+    def test_create_votes_bulk_ndjson(self):
+        """Test creating a batch of votes from newline delimited json"""
+        candidates = [Candidate.objects.create(name='Candidate %d' % i)
+                      for i in range(4)]
+        payload = '\n'.join(json.dumps(
+            {'name': 'Vote %d' % i, 'candidate': candidate.id,
+             'is_vote': True}) for i, candidate in enumerate(candidates))
+        res = self.client.post(VOTES_BULK_URL, data=payload,
+                               content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 4)
+
+    def test_create_votes_bulk_retried(self):
+        """Test retrying a batch neither duplicates votes nor tallies"""
+        payload = [{'name': 'Vote %d' % i, 'candidate': candidate.id,
+                    'is_vote': True}
+                   for i, candidate in enumerate(
+                       (self.candidate_1, self.candidate_2))]
+        for _ in range(2):
+            res = self.client.post(
+                VOTES_BULK_URL, data=json.dumps(payload),
+                content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        self.assertEqual(Vote.objects.count(), 2)
+        tally = CandidateTally.objects.get(candidate=self.candidate_2)
+        self.assertEqual(tally.up_count, 1)
+
+    def test_create_votes_bulk_invalid(self):
+        """Test a batch with an invalid vote creates nothing"""
+        payload = [
+            {'name': 'Vote 1', 'candidate': self.candidate_1.id,
+             'is_vote': True},
+            {'name': 'Vote 2', 'candidate': 0, 'is_vote': True},
+        ]
+        res = self.client.post(VOTES_BULK_URL, data=json.dumps(payload),
+                               content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('candidate', res.data[1])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_create_votes_bulk_rejects_non_integer_ids(self):
+        """Test booleans and fractions are not read as candidate ids"""
+        Candidate.objects.get_or_create(pk=1, defaults={'name': 'First'})
+        for candidate in (True, 1.7):
+            payload = [{'name': 'Vote', 'candidate': candidate,
+                        'is_vote': True}]
+            res = self.client.post(VOTES_BULK_URL, data=json.dumps(payload),
+                                   content_type='application/json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('candidate', res.data[0])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_create_votes_bulk_queries_constant(self):
+        """Test the queries of a batch do not grow with its size"""
+        def post(size):
+            payload = [{'name': 'Vote %d' % i,
+                        'candidate': self.candidate_1.id,
+                        'is_vote': True} for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(VOTES_BULK_URL, data=json.dumps(payload),
+                                 content_type='application/json')
+            return len(queries)
+
+        post(1)
+        self.assertEqual(post(2), post(20))
+
     def test_create_vote_invalid(self):
         """Test creating a new vote with invalid payload"""
         payload = {'name': ''}
         res = self.client.post(VOTES_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(VOTE_WRITE_BEHIND=True)
+class WriteBehindVotesApiTests(TestCase):
+    """Test creating votes in write-behind mode"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'testprivate@example.com',
+            'testprivate1234'
+        )
+        self.candidate = Candidate.objects.create(name='Candidate 1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, url, payload):
+        return self.client.post(url, data=json.dumps(payload),
+                                content_type='application/json')
+
+    def test_create_vote_queued(self):
+        """Test a vote is accepted and saved once the queue drains"""
+        payload = {'name': 'Vote 1', 'candidate': self.candidate.id,
+                   'is_vote': True}
+        res = self.post(VOTES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['name'], 'Vote 1')
+        self.assertFalse(Vote.objects.exists())
+
+        call_command('drain_votes', stdout=StringIO())
+
+        self.assertTrue(Vote.objects.filter(
+            user=self.user, candidate=self.candidate, is_vote=True).exists())
+        self.assertFalse(QueuedVote.objects.exists())
+        self.assertEqual(QueuedVote.pending(), 0)
+
+    def test_create_votes_bulk_queued(self):
+        """Test a batch is queued and saved in order"""
+        payload = [{'name': 'Vote %d' % i, 'candidate': self.candidate.id,
+                    'is_vote': i % 2 == 0} for i in range(3)]
+        res = self.post(VOTES_BULK_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(QueuedVote.pending(), 3)
+
+        call_command('drain_votes', stdout=StringIO())
+
+        self.assertEqual(Vote.objects.get().name, 'Vote 2')
+        tally = CandidateTally.objects.get(candidate=self.candidate)
+        self.assertEqual((tally.up_count, tally.down_count), (1, 0))
+
+    def test_create_vote_invalid_not_queued(self):
+        """Test invalid votes are refused before being queued"""
+        res = self.post(VOTES_URL, {'name': 'Vote 1', 'candidate': 0,
+                                    'is_vote': True})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(QueuedVote.objects.exists())
+
+    @override_settings(VOTE_QUEUE_MAX_PENDING=1)
+    def test_create_vote_queue_full(self):
+        """Test votes are refused while the queue is full"""
+        payload = {'name': 'Vote 1', 'candidate': self.candidate.id,
+                   'is_vote': True}
+        self.post(VOTES_URL, payload)
+
+        res = self.post(VOTES_URL, payload)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(QueuedVote.objects.count(), 1)
+
+        # Drained by a worker process not sharing this process's memory
+        QueuedVote.objects.all().delete()
+        res = self.post(VOTES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
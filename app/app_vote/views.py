@@ -1,18 +1,63 @@
 from app_vote import serializers
-from core.models import Favorite, Candidate, Vote
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from app_vote.caching import CachedReadMixin
+from app_vote.filters import CandidateFilterBackend, CandidateSearchBackend
+from app_vote.pagination import KeysetPagination
+from app_vote.parsers import NDJSONParser
+from core.authentication import CachedTokenAuthentication
+from core.models import Favorite, Candidate, QueuedVote, Vote
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, MethodNotAllowed, \
+    ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, \
     IsAuthenticatedOrReadOnly
 
 
-class BaseVoteAttrViewSet(viewsets.GenericViewSet,
+class QueueFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many votes are waiting to be saved.')
+    default_code = 'queue_full'
+    # Sent as Retry-After by the exception handler
+    wait = 1
+
+
+def is_assigned(candidate):
+    """Return whether the candidate has any live vote or favorite"""
+    return Exists(Vote.objects.filter(candidate=candidate)) | \
+        Exists(Favorite.objects.filter(candidate=candidate))
+
+
+class ValuesListMixin:
+    """List objects as ``.values()`` rows rendered by values_serializer"""
+    values_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.values_serializer.values(queryset)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                self.values_serializer.many(page))
+
+        return Response(self.values_serializer.many(rows))
+
+
+class BaseVoteAttrViewSet(ValuesListMixin,
+                          viewsets.GenericViewSet,
                           mixins.ListModelMixin,
                           mixins.CreateModelMixin,
                           mixins.RetrieveModelMixin):
     """Base viewset for user vote attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
@@ -20,13 +65,11 @@ class BaseVoteAttrViewSet(viewsets.GenericViewSet,
             # Because params will always be string
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(app_vote__isnull=False)
+            queryset = queryset.filter(is_assigned(OuterRef('candidate')))
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return queryset.order_by('-name')
 
     def perform_create(self, serializer):
         """Create a new object"""
@@ -38,6 +81,7 @@ class FavoriteViewSet(BaseVoteAttrViewSet):
 
     queryset = Favorite.objects.all()
     serializer_class = serializers.FavoriteSerializer
+    values_serializer = serializers.favorite_values
 
 
 class VoteViewSet(BaseVoteAttrViewSet):
@@ -45,15 +89,96 @@ class VoteViewSet(BaseVoteAttrViewSet):
 
     queryset = Vote.objects.all()
     serializer_class = serializers.VoteSerializer
-
-
-class CandidateViewSet(viewsets.ModelViewSet):
+    values_serializer = serializers.vote_values
+    bulk_max_items = 5000
+
+    @property
+    def write_behind(self):
+        return getattr(settings, 'VOTE_WRITE_BEHIND', False)
+
+    def create(self, request, *args, **kwargs):
+        if not self.write_behind:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.enqueue(serializer)
+
+    def enqueue(self, serializer):
+        """Queue the validated votes for drain_votes and answer 202"""
+        if QueuedVote.pending() >= getattr(
+                settings, 'VOTE_QUEUE_MAX_PENDING', 100000):
+            raise QueueFull()
+        items = serializer.validated_data
+        if not isinstance(items, list):
+            items = [items]
+        QueuedVote.enqueue([Vote(user=self.request.user, **attrs)
+                            for attrs in items])
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=(JSONParser, NDJSONParser))
+    def bulk(self, request):
+        """Create a batch of votes in a single transaction"""
+        items = request.data
+        if isinstance(items, list) and len(items) > self.bulk_max_items:
+            raise ValidationError(
+                'Ensure this batch has no more than %d items.'
+                % self.bulk_max_items)
+
+        context = self.get_serializer_context()
+        context['prefetched'] = {
+            Candidate: Candidate.objects.in_bulk(
+                self._referenced_ids(items, 'candidate')),
+        }
+        serializer = self.get_serializer(
+            data=items, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+        if self.write_behind:
+            return self.enqueue(serializer)
+        self.perform_create(serializer)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _referenced_ids(items, field):
+        """Return the primary keys the items reference through field"""
+        ids = set()
+        for item in items if isinstance(items, list) else ():
+            try:
+                ids.add(serializers.primary_key(item[field]))
+            except (KeyError, TypeError):
+                pass
+        ids.discard(None)
+        return ids
+
+
+class CandidateBatchMixin:
+    """Batch operations on the candidates of a list of ids"""
+    bulk_max_items = 5000
+
+    def get_batch(self, request):
+        """Return the candidates of the queryset with the posted ids"""
+        serializer = serializers.CandidateIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if len(ids) > self.bulk_max_items:
+            raise ValidationError(
+                'Ensure this batch has no more than %d items.'
+                % self.bulk_max_items)
+        return self.get_queryset().filter(pk__in=ids)
+
+
+class CandidateViewSet(CachedReadMixin, ValuesListMixin, CandidateBatchMixin,
+                       viewsets.ModelViewSet):
     """Manage candidates in the database"""
 
-    queryset = Candidate.objects.all()
+    queryset = Candidate.objects.select_related('tally')
     serializer_class = serializers.CandidateSerializer
-    authentication_classes = (TokenAuthentication,)
+    values_serializer = serializers.candidate_values
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = KeysetPagination
+    filter_backends = (CandidateFilterBackend, CandidateSearchBackend)
 
     def get_queryset(self):
         """Return objects for all users"""
@@ -63,28 +188,62 @@ class CandidateViewSet(viewsets.ModelViewSet):
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(app_vote__isnull=False)
+            queryset = queryset.filter(is_assigned(OuterRef('pk')))
+
+        return queryset.order_by('-name')
+
+    @action(detail=True, methods=['get'])
+    def tally(self, request, pk=None):
+        """Return the vote counts of the candidate"""
+        row = get_object_or_404(
+            serializers.tally_values.values(Candidate.objects.all()), pk=pk)
+        return Response(serializers.tally_values.to_representation(row))
 
-        return queryset.order_by('-name').distinct()
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Soft delete a batch of candidates with their votes, favorites
+        and topics"""
+        return Response({'deleted': self.get_batch(request).soft_delete()})
 
 
-class CandidateAllAPIView(viewsets.ModelViewSet):
+class CandidateAllAPIView(CachedReadMixin, ValuesListMixin,
+                          viewsets.ModelViewSet):
     """Manage deleted candidates"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = KeysetPagination
+    filter_backends = (CandidateFilterBackend, CandidateSearchBackend)
     serializer_class = serializers.CandidateSerializer
+    values_serializer = serializers.candidate_values
     http_method_names = ['get']
 
     def get_queryset(self):
-        return Candidate.objects.all_with_deleted()
+        return Candidate.objects.all_with_deleted().select_related('tally')
 
 
-class CandidateDeletedAPIView(viewsets.ModelViewSet):
+class CandidateDeletedAPIView(CandidateBatchMixin, viewsets.ModelViewSet):
     """Manage deleted candidates"""
 
-    queryset = Candidate.objects.deleted_only()
-    authentication_classes = (TokenAuthentication,)
+    queryset = Candidate.objects.deleted_only().select_related('tally')
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = KeysetPagination
     serializer_class = serializers.CandidateSerializer
-    http_method_names = ['get', 'delete', 'put', 'patch']
+    # POST only reaches the batch actions
+    http_method_names = ['get', 'post', 'delete', 'put', 'patch']
+
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
+
+    @action(detail=False, methods=['post'], url_path='bulk-undelete')
+    def bulk_undelete(self, request):
+        """Undelete a batch of candidates with the votes, favorites and
+        topics deleted along with them"""
+        return Response({'undeleted': self.get_batch(request).undelete()})
+
+    @action(detail=False, methods=['post'], url_path='bulk-purge')
+    def bulk_purge(self, request):
+        """Hard delete a batch of deleted candidates with every row
+        referencing them"""
+        return Response({'purged': self.get_batch(request).purge()})
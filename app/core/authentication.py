@@ -0,0 +1,70 @@
+import pickle
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import TTLCache
+
+TOKEN_CACHE_PREFIX = 'auth-token:'
+
+_tokens = TTLCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_CACHE_MAX_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 30),
+)
+
+
+def _shared_cache():
+    """Return the cache shared between workers, if one is configured"""
+    alias = getattr(settings, 'TOKEN_AUTH_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def cached_user(key):
+    """Return the user of the token key if this process has it cached, or
+    None, without going to the shared cache or the database"""
+    payload = _tokens.get(key)
+    return None if payload is None else pickle.loads(payload)[0]
+
+
+def invalidate_token(key):
+    """Forget the cached user of the token key"""
+    _tokens.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(TOKEN_CACHE_PREFIX + key)
+
+
+def invalidate_user(user):
+    """Forget the cached tokens of the user"""
+    for key in Token.objects.filter(user=user).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the resolved user per token
+
+    Tokens are looked up in an in-process LRU, then in the shared cache
+    named by ``TOKEN_AUTH_CACHE_ALIAS``, and only then in the database.
+    Entries are pickled so every request gets its own user instance.
+    Invalidation reaches the current process and the shared cache; other
+    processes drop their copy after ``TOKEN_AUTH_CACHE_TTL`` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        payload = _tokens.get(key)
+        shared = _shared_cache()
+        if payload is None and shared is not None:
+            payload = shared.get(TOKEN_CACHE_PREFIX + key)
+            if payload is not None:
+                _tokens.set(key, payload)
+
+        if payload is None:
+            user, token = super().authenticate_credentials(key)
+            payload = pickle.dumps((user, token))
+            _tokens.set(key, payload)
+            if shared is not None:
+                shared.set(TOKEN_CACHE_PREFIX + key, payload, _tokens.ttl)
+
+        return pickle.loads(payload)
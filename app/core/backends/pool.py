@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up in time"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of open database connections
+
+    Holds at most max_size connections, in use or idle. ``get`` reuses the
+    most recently returned idle connection, opens a new one below
+    max_size, or waits up to timeout seconds for one to be returned.
+    Connections idle for more than max_idle seconds are closed whenever
+    the pool is used, keeping min_size of them open.
+    """
+
+    def __init__(self, min_size=1, max_size=10, max_idle=300, timeout=30):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        # (returned at, connection), most recently returned last
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def get(self, connect):
+        """Return an idle connection, or a new one made by connect()"""
+        expired = []
+        try:
+            with self._condition:
+                expired = self._expire()
+                deadline = time.monotonic() + self.timeout
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            'No database connection available after %ss.'
+                            % self.timeout)
+                    self._condition.wait(remaining)
+                if self._idle:
+                    return self._idle.pop()[1]
+                self._size += 1
+        finally:
+            self._close(expired)
+
+        try:
+            return connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def put(self, connection, discard=False):
+        """Return a connection from get, closing it when discard"""
+        with self._condition:
+            if discard:
+                self._size -= 1
+                expired = [connection]
+            else:
+                self._idle.append((time.monotonic(), connection))
+                expired = self._expire()
+            self._condition.notify()
+        self._close(expired)
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self._condition:
+            expired = [connection for _, connection in self._idle]
+            self._idle.clear()
+            self._size -= len(expired)
+        self._close(expired)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _expire(self):
+        """Take the connections idle for too long out of the pool"""
+        expired = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and \
+                now - self._idle[0][0] > self.max_idle:
+            expired.append(self._idle.popleft()[1])
+            self._size -= 1
+        return expired
+
+    @staticmethod
+    def _close(connections):
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.backends.pool import ConnectionPool, PoolTimeout
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with connection health checks and an optional
+    connection pool per process
+
+    With ``CONN_HEALTH_CHECKS``, a persistent connection is checked with a
+    query the first time a request uses it, like Django 4.1 does, and
+    replaced when the server dropped it.
+
+    With ``POOL`` and its ``MAX_SIZE`` set, the threads of the process share
+    a ConnectionPool. Connections are returned to it, rolled back, at the
+    end of every request instead of being closed, so ``CONN_MAX_AGE`` does
+    not apply.
+    """
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def get_pool(self):
+        """Return the pool of this database, or None without one"""
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('MAX_SIZE') or self.alias == NO_DB_ALIAS:
+            return None
+        key = (self.alias, self.settings_dict['NAME'])
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ConnectionPool(
+                    min_size=options.get('MIN_SIZE', 1),
+                    max_size=options['MAX_SIZE'],
+                    max_idle=options.get('MAX_IDLE', 300),
+                    timeout=options.get('TIMEOUT', 30))
+            return _pools[key]
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+        if self.get_pool() is not None:
+            # Return the connection at the end of the current request
+            self.close_at = time.monotonic()
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        opened = []
+
+        def connect():
+            opened.append(super(DatabaseWrapper, self).get_new_connection(
+                conn_params))
+            return opened[-1]
+
+        while True:
+            try:
+                connection = pool.get(connect)
+            except PoolTimeout as e:
+                raise Database.OperationalError(str(e))
+            # Only connections reused from the pool can have been dropped
+            if opened or not self.health_check_enabled or \
+                    self.ping(connection):
+                break
+            pool.put(connection, discard=True)
+
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.put(self.connection, discard=self.errors_occurred or
+                     not self.reset(self.connection))
+
+    def close_if_unusable_or_obsolete(self):
+        if self.connection is not None:
+            self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Close the connection if it fails its first check of a request"""
+        if self.connection is None or not self.health_check_enabled or \
+                self.health_check_done:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    @staticmethod
+    def ping(connection):
+        """Return whether the raw connection answers a query"""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    @staticmethod
+    def reset(connection):
+        """Roll back the raw connection for its next user, and return
+        whether it can be reused"""
+        if connection.closed:
+            return False
+        try:
+            if connection.info.transaction_status != \
+                    extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Database.Error:
+            return False
+        return True
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
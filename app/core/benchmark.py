@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+
+from django_seed import Seed
+
+from core.models import Candidate, CandidateTally, CandidateTopic, \
+    Category, City, Country, Favorite, State, SubCategory, Topic, User, Vote
+
+
+class Rollback(Exception):
+    """Raised to discard a seeded dataset"""
+
+
+def _words(count):
+    """Return a pool of fake words to draw bulk names from"""
+    faker = Seed.faker()
+    return [faker.word() for _ in range(count)]
+
+
+def _bulk_insert(model, count, build, batch_size, ids=True):
+    """Insert count rows built by build(i) in batches and return their ids"""
+    for start in range(0, count, batch_size):
+        model.objects.bulk_create(
+            [build(i) for i in range(start, min(start + batch_size, count))])
+    if ids:
+        return list(model.objects.order_by('-id').values_list(
+            'id', flat=True)[:count])
+
+
+def seed_tree(models, counts, batch_size=5000):
+    """Insert a parent-child hierarchy of models and return the leaf ids
+
+    models are ordered from the root, as pairs of model and the name of
+    the foreign key to the previous level (None for the root).
+    """
+    words = _words(500)
+    parent_ids = None
+    for (model, parent), count in zip(models, counts):
+        def build(i, model=model, parent=parent, parent_ids=parent_ids):
+            attrs = {'name': '%s %s' % (random.choice(words).title(), i)}
+            if parent:
+                attrs[parent + '_id'] = random.choice(parent_ids)
+            return model(**attrs)
+        parent_ids = _bulk_insert(model, count, build, batch_size)
+        model.generation.changed()
+    return parent_ids
+
+
+def seed_locations(countries, states, cities, batch_size=5000):
+    """Insert a Country, State and City hierarchy and return the cities"""
+    return seed_tree(((Country, None), (State, 'country'), (City, 'state')),
+                     (countries, states, cities), batch_size)
+
+
+def seed_topics(categories, sub_categories, topics, batch_size=5000):
+    """Insert a Category, SubCategory and Topic hierarchy and return the
+    topics"""
+    return seed_tree(((Category, None), (SubCategory, 'category'),
+                      (Topic, 'sub_category')),
+                     (categories, sub_categories, topics), batch_size)
+
+
+def seed_votes(users, candidates, votes, favorites=0, batch_size=5000,
+               city_ids=None, topic_ids=None):
+    """Bulk insert a synthetic voting dataset and return the users
+
+    Candidates and users are spread over city_ids, and every candidate
+    gets one to three of topic_ids, when given. Users vote at most once
+    per candidate, capping votes at users * candidates. Tallies are
+    rebuilt from the inserted votes.
+    """
+    faker = Seed.faker()
+    names = [faker.name() for _ in range(min(users + candidates, 2000))]
+    words = _words(1000)
+
+    def city():
+        return random.choice(city_ids) if city_ids else None
+
+    user_ids = _bulk_insert(User, users, lambda i: User(
+        email='bench%d@example.com' % i, name=random.choice(names),
+        password='!', city_id=city()), batch_size)
+
+    descriptions = [faker.paragraph() for _ in range(200)]
+    candidate_ids = _bulk_insert(Candidate, candidates, lambda i: Candidate(
+        name=random.choice(names), description=random.choice(descriptions),
+        city_id=city()), batch_size)
+
+    if topic_ids:
+        topics = [(candidate_id, topic_id)
+                  for candidate_id in candidate_ids
+                  for topic_id in random.sample(
+                      topic_ids, min(len(topic_ids), random.randint(1, 3)))]
+        taxonomy = {
+            topic_id: (sub_category_id, category_id)
+            for topic_id, sub_category_id, category_id in
+            Topic.objects.filter(pk__in=topic_ids).values_list(
+                'id', 'sub_category_id', 'sub_category__category_id')}
+        _bulk_insert(CandidateTopic, len(topics), lambda i: CandidateTopic(
+            name=random.choice(words), candidate_id=topics[i][0],
+            topic_id=topics[i][1],
+            sub_category_id=taxonomy[topics[i][1]][0],
+            category_id=taxonomy[topics[i][1]][1]), batch_size, ids=False)
+
+    def attrs():
+        return {'name': random.choice(words),
+                'user_id': random.choice(user_ids),
+                'candidate_id': random.choice(candidate_ids)}
+
+    # A user votes once per candidate, so votes are drawn from the pairs
+    pairs = random.sample(range(len(user_ids) * len(candidate_ids)),
+                          min(votes, len(user_ids) * len(candidate_ids)))
+    _bulk_insert(Vote, len(pairs), lambda i: Vote(
+        name=random.choice(words), is_vote=random.random() < 0.7,
+        user_id=user_ids[pairs[i] // len(candidate_ids)],
+        candidate_id=candidate_ids[pairs[i] % len(candidate_ids)]),
+        batch_size, ids=False)
+    _bulk_insert(Favorite, favorites, lambda i: Favorite(**attrs()),
+                 batch_size, ids=False)
+    CandidateTally.rebuild(batch_size)
+
+    return user_ids
+
+
+def percentiles(timings):
+    """Return the latency percentiles in ms of timings in ms"""
+    timings = sorted(timings)
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'p99': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+
+
+def measure(func, repeat):
+    """Run func repeat times and return its latency percentiles in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
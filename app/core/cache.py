@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after ttl
+
+    Used for small hot lookups that would otherwise hit the database on
+    every request. Values are shared between threads, so store immutable
+    values or copy them on the way out.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Generation:
+    """Version number of a cached dataset kept in the
+    GENERATION_CACHE_ALIAS cache
+
+    Caches built from the dataset embed the current value in their keys,
+    so bumping it invalidates all of them at once. Only processes sharing
+    that cache see each other's bumps. When it lives in process memory,
+    every generation expires after GENERATION_LOCAL_TTL seconds instead,
+    bounding how long a process serves data changed by another one.
+    """
+
+    def __init__(self, name, alias=None):
+        self.key = 'generation:%s' % name
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(
+            settings, 'GENERATION_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        if isinstance(self.cache, LocMemCache):
+            return getattr(settings, 'GENERATION_LOCAL_TTL', 60)
+        return None
+
+    def get(self):
+        # Start from the clock so an evicted counter never repeats a value
+        return self.cache.get_or_set(self.key, time.time_ns(), self.timeout)
+
+    def bump(self):
+        try:
+            self.cache.incr(self.key)
+        except ValueError:
+            self.cache.set(self.key, time.time_ns(), self.timeout)
+
+    def changed(self):
+        """Bump now and again once the current transaction commits"""
+        self.bump()
+        transaction.on_commit(self.bump)
+
+
+candidate_generation = Generation('candidates')
+location_generation = Generation('locations')
+taxonomy_generation = Generation('taxonomy')
+
+
+def filter_generation(user_id):
+    """Return the generation of the saved filters of a user"""
+    return Generation('filters:%d' % user_id)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the costs of the ARGON2_TIME_COST, ARGON2_MEMORY_COST
+    (in KiB) and ARGON2_PARALLELISM settings
+
+    Hashes made with other costs still verify, and are rehashed with the
+    current ones at the next login.
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', 2)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', 19456)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', 1)
@@ -0,0 +1,117 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from core.cache import location_generation, taxonomy_generation
+from core.models import Category, City, Country, State, SubCategory, Topic
+
+
+class Level:
+    """Sorted ids of one level of a hierarchy with their parent ids"""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = array('q', (row[0] for row in rows))
+        self.parents = array('q', (row[1] or 0 for row in rows))
+
+    def parent(self, id):
+        """Return the parent id of id, or None when id is unknown"""
+        index = bisect_left(self.ids, id)
+        if index < len(self.ids) and self.ids[index] == id:
+            return self.parents[index] or None
+        return None
+
+    def children(self):
+        """Return the ids of every level row keyed by parent id"""
+        children = {}
+        for id, parent in zip(self.ids, self.parents):
+            children.setdefault(parent, array('q')).append(id)
+        return children
+
+
+class Hierarchy:
+    """Snapshot of the live rows of a three level hierarchy
+
+    ``levels`` lists the root, middle and leaf models with the name of
+    their foreign key to the level above. Every level is kept as sorted
+    id and parent id arrays, so resolving a leaf or expanding a root or
+    middle row is done in memory.
+    """
+    levels = ()
+
+    def __init__(self, generation):
+        self.generation = generation
+        (root, _), (middle, to_root), (leaf, to_middle) = self.levels
+        self.roots = array('q', sorted(
+            root.objects.values_list('id', flat=True)))
+        self.middles = Level(
+            middle.objects.values_list('id', to_root + '_id'))
+        self.leaves = Level(leaf.objects.values_list('id', to_middle + '_id'))
+        self._middles_by_root = self.middles.children()
+        self._leaves_by_middle = self.leaves.children()
+
+    def middle_of(self, leaf_id):
+        return self.leaves.parent(leaf_id)
+
+    def root_of(self, leaf_id):
+        middle_id = self.middle_of(leaf_id)
+        return middle_id and self.middles.parent(middle_id)
+
+    def middles_in_root(self, root_id):
+        return tuple(self._middles_by_root.get(root_id, ()))
+
+    def leaves_in_middle(self, middle_id):
+        return tuple(self._leaves_by_middle.get(middle_id, ()))
+
+    def leaves_in_root(self, root_id):
+        return tuple(leaf_id
+                     for middle_id in self._middles_by_root.get(root_id, ())
+                     for leaf_id in self._leaves_by_middle.get(middle_id, ()))
+
+
+class LocationTree(Hierarchy):
+    """Snapshot of the live Country, State and City hierarchy"""
+    levels = ((Country, None), (State, 'country'), (City, 'state'))
+
+    state_of = Hierarchy.middle_of
+    country_of = Hierarchy.root_of
+    states_in_country = Hierarchy.middles_in_root
+    cities_in_state = Hierarchy.leaves_in_middle
+    cities_in_country = Hierarchy.leaves_in_root
+
+
+class TaxonomyTree(Hierarchy):
+    """Snapshot of the live Category, SubCategory and Topic hierarchy"""
+    levels = ((Category, None), (SubCategory, 'category'),
+              (Topic, 'sub_category'))
+
+    sub_category_of = Hierarchy.middle_of
+    category_of = Hierarchy.root_of
+    sub_categories_in_category = Hierarchy.middles_in_root
+    topics_in_sub_category = Hierarchy.leaves_in_middle
+    topics_in_category = Hierarchy.leaves_in_root
+
+
+class CachedHierarchy:
+    """Process wide hierarchy snapshot reloaded when its generation moves"""
+
+    def __init__(self, hierarchy_class, generation):
+        self.hierarchy_class = hierarchy_class
+        self.generation = generation
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        generation = self.generation.get()
+        tree = self._tree
+        if tree is None or tree.generation != generation:
+            with self._lock:
+                if self._tree is None or \
+                        self._tree.generation != generation:
+                    self._tree = self.hierarchy_class(generation)
+                tree = self._tree
+        return tree
+
+
+location_tree = CachedHierarchy(LocationTree, location_generation)
+taxonomy_tree = CachedHierarchy(TaxonomyTree, taxonomy_generation)
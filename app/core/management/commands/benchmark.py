@@ -0,0 +1,151 @@
+import json
+import time
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import Rollback, percentiles, seed_locations, \
+    seed_topics, seed_votes
+from core.models import Candidate, Category, Country, User
+
+PASSWORD = 'benchmark1234'
+
+
+class Command(BaseCommand):
+    """Django command to seed a realistic dataset and benchmark the API
+
+    The dataset is rolled back afterwards unless --keep is given.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--countries', type=int, default=10)
+        parser.add_argument('--states', type=int, default=200)
+        parser.add_argument('--cities', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--sub-categories', type=int, default=100)
+        parser.add_argument('--topics', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--candidates', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=1000000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--keep', action='store_true')
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                report = {'dataset': self.seed(options)}
+                report['endpoints'] = self.run(options['requests'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        for name, result in report['endpoints'].items():
+            self.stdout.write(
+                '%-32s p50 %8.2fms p95 %8.2fms p99 %8.2fms '
+                '%5.1f queries %10.0f rows/s'
+                % (name, result['p50'], result['p95'], result['p99'],
+                   result['queries'], result['rows_per_sec']))
+
+    def seed(self, options):
+        """Seed the dataset and return its size"""
+        started = time.perf_counter()
+        city_ids = seed_locations(
+            options['countries'], options['states'], options['cities'])
+        topic_ids = seed_topics(
+            options['categories'], options['sub_categories'],
+            options['topics'])
+        seed_votes(options['users'], options['candidates'],
+                   options['votes'], options['favorites'],
+                   city_ids=city_ids, topic_ids=topic_ids)
+
+        dataset = {name: options[name] for name in (
+            'countries', 'states', 'cities', 'categories', 'sub_categories',
+            'topics', 'users', 'candidates', 'votes', 'favorites')}
+        dataset['seconds'] = time.perf_counter() - started
+        return dataset
+
+    def run(self, requests):
+        """Return the statistics of every benchmarked endpoint"""
+        user = User.objects.filter(email__startswith='bench').first()
+        user.set_password(PASSWORD)
+        user.save()
+        token = Token.objects.create(user=user)
+        candidate = Candidate.objects.first()
+
+        anonymous = Client(HTTP_HOST='localhost')
+        client = Client(HTTP_HOST='localhost',
+                        HTTP_AUTHORIZATION='Token ' + token.key)
+        candidates_url = reverse('app_vote:candidate-list')
+        second_page = client.get(candidates_url).json()['next']
+        vote = {'name': 'Benchmark', 'candidate': candidate.id,
+                'is_vote': True}
+
+        endpoints = {
+            'candidate list (anonymous)': (
+                anonymous, 'get', candidates_url, {}),
+            'candidate list': (client, 'get', candidates_url, {}),
+            'candidate list by category': (client, 'get', candidates_url, {
+                'data': {'category': Category.objects.first().id}}),
+            'candidate list by country': (client, 'get', candidates_url, {
+                'data': {'country': Country.objects.first().id}}),
+            'candidate search': (client, 'get', candidates_url, {
+                'data': {'search': candidate.name.split()[0]}}),
+            'candidate detail': (client, 'get', reverse(
+                'app_vote:candidate-detail', args=[candidate.id]), {}),
+            'vote list': (client, 'get', reverse('app_vote:vote-list'), {}),
+            'favorite list': (
+                client, 'get', reverse('app_vote:favorite-list'), {}),
+            'vote create': (client, 'post', reverse('app_vote:vote-list'), {
+                'data': json.dumps(vote),
+                'content_type': 'application/json'}),
+            'vote bulk create': (
+                client, 'post', reverse('app_vote:vote-bulk'), {
+                    'data': json.dumps([vote] * 100),
+                    'content_type': 'application/json'}),
+            'user me': (client, 'get', reverse('app_user:me'), {}),
+            'user token': (anonymous, 'post', reverse('app_user:token'), {
+                'data': {'email': user.email, 'password': PASSWORD}}),
+        }
+        if second_page:
+            endpoints['candidate list page 2'] = (
+                client, 'get', second_page, {})
+        return {
+            name: self.run_endpoint(requests, *endpoint)
+            for name, endpoint in endpoints.items()
+        }
+
+    def run_endpoint(self, requests, client, method, url, kwargs):
+        """Return the latency, queries and rows per second of a request"""
+        timings, queries, rows = [], 0, 0
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                res = getattr(client, method)(url, **kwargs)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries += len(captured)
+            rows += self.count_rows(res)
+
+        return dict(percentiles(timings),
+                    status=res.status_code,
+                    queries=queries / requests,
+                    rows_per_sec=rows / (sum(timings) / 1000))
+
+    @staticmethod
+    def count_rows(res):
+        """Return the number of objects in a response body"""
+        if res.status_code >= 300:
+            return 0
+        data = res.json()
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+        return len(data)
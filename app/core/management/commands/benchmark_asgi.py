@@ -0,0 +1,200 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import percentiles
+from core.models import Candidate, User
+
+HOST = 'localhost'
+
+# Django's threaded WSGI server, as started by runserver, without the
+# autoreloader and the request log
+WSGI_SERVER = (
+    'import logging, sys\n'
+    'from django.core.servers.basehttp import run\n'
+    'from app.wsgi import application\n'
+    'logging.getLogger("django.server").disabled = True\n'
+    'run("127.0.0.1", int(sys.argv[1]), application, threading=True)\n'
+)
+
+SERVERS = {
+    'wsgi': lambda port: ['-c', WSGI_SERVER, str(port)],
+    'asgi': lambda port: [
+        '-m', 'uvicorn', 'app.asgi:application', '--host', '127.0.0.1',
+        '--port', str(port), '--lifespan', 'off', '--no-access-log',
+        '--log-level', 'warning'],
+}
+
+
+def free_port():
+    """Return a TCP port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_load(port, path, headers, requests, concurrency):
+    """GET path requests times over concurrency keep-alive connections and
+    return the latency percentiles, throughput and errors"""
+    pending = iter(range(requests))
+    timings = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        client = HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            while next(pending, None) is not None:
+                started = time.perf_counter()
+                try:
+                    client.request('GET', path, headers=headers)
+                    res = client.getresponse()
+                    res.read()
+                    failed = res.status >= 400
+                except (HTTPException, OSError):
+                    client.close()
+                    failed = True
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    errors += failed
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return dict(percentiles(timings),
+                requests_per_sec=len(timings) / elapsed,
+                errors=errors)
+
+
+class Command(BaseCommand):
+    """Django command to load test the candidate reads served by the WSGI
+    application and by the ASGI application under uvicorn
+
+    Both servers run one process against the current database, so seed it
+    first, e.g. with benchmark --keep.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=list(SERVERS))
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Seconds to wait for a server to start')
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        candidate = Candidate.objects.first()
+        user = User.objects.first()
+        if candidate is None or user is None:
+            raise CommandError('Seed candidates and users first.')
+        token, _ = Token.objects.get_or_create(user=user)
+
+        anonymous = {'Host': HOST}
+        authenticated = dict(anonymous, Authorization='Token ' + token.key)
+        endpoints = {
+            'candidate list (anonymous)': (
+                reverse('app_vote:candidate-list'), anonymous),
+            'candidate list': (
+                reverse('app_vote:candidate-list'), authenticated),
+            'candidate detail': (reverse(
+                'app_vote:candidate-detail', args=[candidate.id]),
+                authenticated),
+            'candidate tally': (reverse(
+                'app_vote:candidate-tally', args=[candidate.id]),
+                authenticated),
+        }
+
+        report = {}
+        for server in options['servers']:
+            with tempfile.TemporaryFile() as log:
+                process, port = self.start(server, log, options['timeout'])
+                try:
+                    report[server] = self.run(port, endpoints, options)
+                finally:
+                    self.stop(process)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        for server, results in report.items():
+            for name, result in results.items():
+                self.stdout.write(
+                    '%-4s %-28s %8.0f req/s p50 %8.2fms p95 %8.2fms '
+                    'p99 %8.2fms %5d errors'
+                    % (server, name, result['requests_per_sec'],
+                       result['p50'], result['p95'], result['p99'],
+                       result['errors']))
+
+    @staticmethod
+    def run(port, endpoints, options):
+        """Return the load statistics of every endpoint"""
+        results = {}
+        for name, (path, headers) in endpoints.items():
+            # Warms the connections, pools and token caches
+            run_load(port, path, headers, options['concurrency'],
+                     options['concurrency'])
+            results[name] = run_load(port, path, headers,
+                                     options['requests'],
+                                     options['concurrency'])
+        return results
+
+    def start(self, server, log, timeout):
+        """Start server on a free port, connected to the current database
+        and logging to log, and return its process and port once it
+        answers"""
+        params = connection.settings_dict
+        env = dict(os.environ, DB_HOST=params['HOST'] or '',
+                   DB_NAME=params['NAME'], DB_USER=params['USER'] or '',
+                   DB_PASS=params['PASSWORD'] or '')
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, *SERVERS[server](port)], cwd=settings.BASE_DIR,
+            env=env, stdout=subprocess.DEVNULL, stderr=log)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None or time.monotonic() > deadline:
+                self.stop(process)
+                log.seek(0)
+                raise CommandError('The %s server did not start:\n%s' % (
+                    server, log.read().decode(errors='replace')))
+            client = HTTPConnection('127.0.0.1', port, timeout=timeout)
+            try:
+                client.request('GET', '/', headers={'Host': HOST})
+                client.getresponse().read()
+                return process, port
+            except OSError:
+                time.sleep(0.1)
+            finally:
+                client.close()
+
+    @staticmethod
+    def stop(process):
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmark import Rollback
+
+PASSWORD = 'benchmark1234'
+
+HASHERS = {
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+
+
+def post(client, path, data):
+    res = client.post(path, data)
+    if res.status_code >= 300:
+        raise CommandError('POST %s failed with %d' % (
+            path, res.status_code))
+
+
+class Command(BaseCommand):
+    """Django command to measure signups and logins per second per core
+    with each password hasher
+
+    Signups and logins go through the API one at a time, on one core. The
+    hashing rate is also measured over --threads threads, to show how it
+    scales across cores. Every user is rolled back.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', choices=HASHERS,
+                            default=list(HASHERS))
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=os.cpu_count())
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        report = {}
+        for name in options['hashers']:
+            with override_settings(PASSWORD_HASHERS=[HASHERS[name]]):
+                report[name] = self.measure(options['users'],
+                                            options['threads'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in report.items():
+            self.stdout.write(
+                '%s: %.1f signups/s, %.1f logins/s per core, '
+                '%.1f hashes/s per core over %d threads'
+                % (name, result['signups_per_sec'],
+                   result['logins_per_sec'],
+                   result['hashes_per_sec_per_core'], result['threads']))
+
+    @staticmethod
+    def measure(users, threads):
+        """Return the signup, login and hashing rates"""
+        client = Client(HTTP_HOST='localhost')
+        emails = ['benchmark%d@example.com' % i for i in range(users)]
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                for email in emails:
+                    post(client, reverse('app_user:create'), {
+                        'email': email, 'name': 'Benchmark',
+                        'password': PASSWORD,
+                        'password_confirmation': PASSWORD})
+                signups = time.perf_counter() - started
+
+                started = time.perf_counter()
+                for email in emails:
+                    post(client, reverse('app_user:token'),
+                         {'email': email, 'password': PASSWORD})
+                logins = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+
+        with ThreadPoolExecutor(threads) as executor:
+            started = time.perf_counter()
+            list(executor.map(make_password, [PASSWORD] * users * threads))
+            hashing = time.perf_counter() - started
+        cores = min(threads, os.cpu_count())
+
+        return {
+            'signups_per_sec': users / signups,
+            'logins_per_sec': users / logins,
+            'hashes_per_sec_per_core': users * threads / hashing / cores,
+            'threads': threads,
+        }
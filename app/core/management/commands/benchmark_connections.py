@@ -0,0 +1,82 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+from core.benchmark import percentiles
+
+MODES = {
+    'no persistence': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+                       'POOL': None},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False,
+                   'POOL': None},
+    'persistent, health checks': {'CONN_MAX_AGE': 600,
+                                  'CONN_HEALTH_CHECKS': True,
+                                  'POOL': None},
+    'pooled, health checks': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+                              'POOL': {'MIN_SIZE': 1, 'MAX_SIZE': 1}},
+}
+
+
+class Command(BaseCommand):
+    """Django command to measure the per request cost of setting up database
+    connections, with and without persistent and pooled connections
+
+    Every simulated request runs the checks Django runs when requests start
+    and finish around its queries, on its own connection to the database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=1,
+                            help='Queries per request')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options['database']].settings_dict
+        report = {
+            name: self.measure(dict(settings_dict, **overrides),
+                               'benchmark_%d' % index, options['requests'],
+                               options['queries'])
+            for index, (name, overrides) in enumerate(MODES.items())
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in report.items():
+            self.stdout.write(
+                '%s: p50 %.2fms p95 %.2fms p99 %.2fms, %d connections'
+                % (name, result['p50'], result['p95'], result['p99'],
+                   result['connections']))
+
+    @staticmethod
+    def measure(settings_dict, alias, requests, queries):
+        """Return the latency percentiles of requests requests and the
+        number of connections they opened"""
+        backend = load_backend(settings_dict['ENGINE'])
+        connection = backend.DatabaseWrapper(settings_dict, alias)
+        # Registered for the connection_created receivers
+        connections[alias] = connection
+        timings = []
+        backend_pids = set()
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                connection.close_if_unusable_or_obsolete()
+                for _ in range(queries):
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                backend_pids.add(connection.connection.get_backend_pid())
+                connection.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+            del connections[alias]
+            pool = getattr(connection, 'get_pool', lambda: None)()
+            if pool is not None:
+                pool.close_idle()
+        return dict(percentiles(timings), connections=len(backend_pids))
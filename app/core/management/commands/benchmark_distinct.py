@@ -0,0 +1,44 @@
+import json
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+from core.benchmark import Rollback, measure, seed_votes
+from core.models import Candidate
+
+
+class Command(BaseCommand):
+    """Django command to measure the cost of DISTINCT on candidate lists"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        plain = Candidate.objects.order_by('-name', '-id').values_list()
+        querysets = {
+            'distinct list': plain.distinct(),
+            'plain list': plain,
+            'distinct page': plain.distinct()[:100],
+            'plain page': plain[:100],
+        }
+        try:
+            with transaction.atomic():
+                seed_votes(1, options['candidates'], 0)
+                report = {
+                    name: measure(lambda: len(queryset.all()),
+                                  options['repeat'])
+                    for name, queryset in querysets.items()
+                }
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in report.items():
+            self.stdout.write(
+                '%s: p50 %.2fms p95 %.2fms p99 %.2fms'
+                % (name, result['p50'], result['p95'], result['p99']))
@@ -0,0 +1,97 @@
+import json
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from app_vote.filters import filter_candidates
+from core.benchmark import Rollback, measure, seed_topics, seed_votes
+from core.models import Candidate, Favorite, Topic, Vote
+
+INDEXES = (
+    'candidate_name_live_idx',
+    'vote_user_name_live_idx',
+    'vote_candidate_live_idx',
+    'favorite_user_name_live_idx',
+    'ctopic_topic_live_idx',
+    'ctopic_sub_category_live_idx',
+    'ctopic_category_live_idx',
+)
+
+
+class Command(BaseCommand):
+    """Django command to compare list query plans with and without the
+    partial indexes on live rows"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--candidates', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=200000)
+        parser.add_argument('--topics', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                topic_ids = seed_topics(
+                    max(options['topics'] // 100, 1),
+                    max(options['topics'] // 10, 1), options['topics'])
+                user_ids = seed_votes(options['users'],
+                                      options['candidates'],
+                                      options['votes'],
+                                      options['votes'] // 4,
+                                      topic_ids=topic_ids)
+                queries = self.get_queries(
+                    user_ids[0], Topic.objects.select_related(
+                        'sub_category').get(pk=topic_ids[0]))
+                report = {'after': self.run(queries, options['repeat'])}
+                with connection.cursor() as cursor:
+                    for name in INDEXES:
+                        cursor.execute('DROP INDEX %s' % name)
+                report['before'] = self.run(queries, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for label in ('before', 'after'):
+            for name, result in report[label].items():
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    '%s indexes: %s' % (label, name)))
+                self.stdout.write(result['plan'])
+                self.stdout.write(
+                    'p50 %(p50).2fms p95 %(p95).2fms p99 %(p99).2fms\n'
+                    % result)
+
+    def get_queries(self, user_id, topic):
+        """Return the hot list querysets keyed by name"""
+        candidates = Candidate.objects.order_by('-name', '-id')
+        return {
+            'candidate list': candidates[:100],
+            'candidate list by topic': filter_candidates(
+                candidates, QueryDict('topic=%d' % topic.id))[:100],
+            'candidate list by category': filter_candidates(
+                candidates, QueryDict(
+                    'category=%d' % topic.sub_category.category_id))[:100],
+            'vote list': Vote.objects.filter(
+                user_id=user_id).order_by('-name', '-id')[:100],
+            'favorite list': Favorite.objects.filter(
+                user_id=user_id).order_by('-name', '-id')[:100],
+            'candidate tally': Vote.objects.filter(
+                candidate_id=Candidate.objects.values('id')[:1]).values(
+                    'is_vote').annotate(total=Count('id')).order_by(),
+        }
+
+    def run(self, queries, repeat):
+        """Return the plan and latency of every query"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return {
+            name: dict(plan=queryset.explain(),
+                       **measure(lambda: list(queryset.all()), repeat))
+            for name, queryset in queries.items()
+        }
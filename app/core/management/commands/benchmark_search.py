@@ -0,0 +1,69 @@
+import json
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+
+from app_vote.filters import search_candidates, trigram_available
+from core.benchmark import Rollback, measure, seed_votes
+from core.models import Candidate
+
+
+class Command(BaseCommand):
+    """Django command to compare full-text and trigram candidate search
+    with icontains scans"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                seed_votes(1, options['candidates'], 0)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE core_candidate')
+                report = self.run(self.get_searches(), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(result['plan'])
+            self.stdout.write(
+                'p50 %(p50).2fms p95 %(p95).2fms p99 %(p99).2fms '
+                '%(rows)d rows\n' % result)
+
+    def get_searches(self):
+        """Return functions building the first page of each search"""
+        name = Candidate.objects.values_list('name', flat=True).first()
+        word = name.split()[0]
+        typo = word[:-1] + ('a' if word[-1] != 'a' else 'e')
+        candidates = Candidate.objects.all()
+
+        searches = {
+            'icontains %r' % word: lambda: candidates.filter(
+                Q(name__icontains=word) | Q(description__icontains=word)
+            ).order_by('-name', '-id')[:100],
+            'full-text %r' % word: lambda: search_candidates(
+                candidates, word).order_by('-rank', '-id')[:100],
+            'full-text prefix %r' % word[:3]: lambda: search_candidates(
+                candidates, word[:3]).order_by('-rank', '-id')[:100],
+        }
+        if trigram_available(candidates.db):
+            searches['trigram %r' % typo] = lambda: candidates.filter(
+                name__trigram_similar=typo).order_by('-name', '-id')[:100]
+        return searches
+
+    def run(self, searches, repeat):
+        """Return the plan, latency and row count of every search"""
+        return {
+            name: dict(plan=search().explain(), rows=len(search()),
+                       **measure(lambda: list(search()), repeat))
+            for name, search in searches.items()
+        }
@@ -0,0 +1,56 @@
+import json
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from app_vote.serializers import CandidateSerializer, candidate_values
+from core.benchmark import Rollback, measure, seed_votes
+from core.models import Candidate
+
+
+class Command(BaseCommand):
+    """Django command to compare the model and values candidate
+    serializers"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        queryset = Candidate.objects.select_related('tally').order_by(
+            '-name', '-id')
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            return renderer.render(
+                CandidateSerializer(queryset.all(), many=True).data)
+
+        def values_serializer():
+            return renderer.render(
+                candidate_values.many(candidate_values.values(queryset)))
+
+        try:
+            with transaction.atomic():
+                seed_votes(1, options['candidates'], options['candidates'])
+                report = {
+                    'identical': model_serializer() == values_serializer(),
+                    'model': measure(model_serializer, options['repeat']),
+                    'values': measure(values_serializer, options['repeat']),
+                }
+                raise Rollback
+        except Rollback:
+            pass
+        report['speedup'] = report['model']['p50'] / report['values']['p50']
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name in ('model', 'values'):
+            self.stdout.write(
+                '%s: p50 %.2fms p95 %.2fms p99 %.2fms'
+                % ((name,) + tuple(report[name][p]
+                                   for p in ('p50', 'p95', 'p99'))))
+        self.stdout.write('speedup: %.1fx, identical output: %s'
+                          % (report['speedup'], report['identical']))
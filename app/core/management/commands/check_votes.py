@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from core.models import CandidateTally, QueuedVote, Vote
+
+
+class Command(BaseCommand):
+    """Django command to check the candidate tallies against the votes and
+    report the write-behind queue"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Rebuild the tallies when they differ')
+
+    def handle(self, *args, **options):
+        queue = QueuedVote.objects.aggregate(
+            count=Count('id'), oldest=Min('created'))
+        if queue['count']:
+            self.stdout.write('%d queued votes, oldest %.0fs ago' % (
+                queue['count'],
+                (timezone.now() - queue['oldest']).total_seconds()))
+
+        mismatches = self.get_mismatches()
+        for candidate_id, expected, actual in mismatches:
+            self.stdout.write(
+                'Candidate %d: tally %s, votes %s' % (
+                    candidate_id, actual, expected))
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Tallies match the votes!'))
+        elif options['fix']:
+            CandidateTally.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                'Rebuilt the tallies of %d candidates!' % len(mismatches)))
+        else:
+            raise CommandError(
+                '%d tallies differ from the votes' % len(mismatches))
+
+    @staticmethod
+    def get_mismatches():
+        """Return (candidate id, vote counts, tally counts) of every
+        candidate whose tally differs from its live votes"""
+        votes = {
+            row['candidate_id']: (row['up_count'], row['down_count'])
+            for row in Vote.objects.order_by().values('candidate_id').annotate(
+                up_count=Count('id', filter=Q(is_vote=True)),
+                down_count=Count('id', filter=Q(is_vote=False))).iterator()
+        }
+        tallies = {
+            candidate_id: (up_count, down_count)
+            for candidate_id, up_count, down_count in
+            CandidateTally.objects.values_list(
+                'candidate_id', 'up_count', 'down_count').iterator()
+        }
+        mismatches = []
+        for candidate_id in sorted(set(votes) | set(tallies)):
+            expected = votes.get(candidate_id, (0, 0))
+            actual = tallies.get(candidate_id, (0, 0))
+            if expected != actual:
+                mismatches.append((candidate_id, expected, actual))
+        return mismatches
@@ -0,0 +1,51 @@
+import time
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import QueuedVote
+
+
+class Command(BaseCommand):
+    """Django command to save the votes queued in write-behind mode
+
+    Only one worker may drain a partition, which keeps the votes of every
+    user in order; run one worker per partition to drain in parallel.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--partitions', type=int, default=1)
+        parser.add_argument('--partition', type=int, default=0)
+        parser.add_argument('--forever', action='store_true')
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        partition, partitions = options['partition'], options['partitions']
+        lock = zlib.crc32(b'drain_votes') + partition
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock])
+            if not cursor.fetchone()[0]:
+                raise CommandError(
+                    'Partition %d is drained by another worker' % partition)
+        try:
+            total = self.drain(options, partition, partitions)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [lock])
+
+        self.stdout.write(self.style.SUCCESS('Saved %d queued votes!' % total))
+
+    def drain(self, options, partition, partitions):
+        """Drain the partition until it is empty, or forever, and return
+        the number of votes saved"""
+        total = 0
+        while True:
+            saved = QueuedVote.drain(
+                options['batch_size'], partition, partitions)
+            total += saved
+            if saved < options['batch_size']:
+                if not options['forever']:
+                    return total
+                time.sleep(options['interval'])
@@ -0,0 +1,83 @@
+import csv
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+
+# Columns copied to the users besides email, password and password_hash
+FIELDS = ('name', 'working_id')
+
+
+def is_valid_hash(encoded):
+    """Return whether encoded is a whole hash of a configured hasher"""
+    try:
+        return bool(identify_hasher(encoded).decode(encoded)['hash'])
+    except (ValueError, TypeError, AssertionError):
+        return False
+
+
+class Command(BaseCommand):
+    """Django command to bulk import users from a CSV file
+
+    The file has a header row and an email column, with either a password
+    column, hashed here by --workers threads, or a password_hash column
+    of hashes made by Django. Users with an email already taken are
+    skipped, so an interrupted import can simply be run again. Each batch
+    is inserted with a single statement.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        imported = skipped = 0
+        with open(options['path'], newline='') as source, \
+                ThreadPoolExecutor(options['workers']) as executor:
+            reader = csv.DictReader(source)
+            if 'email' not in (reader.fieldnames or ()):
+                raise CommandError('The file needs an email column.')
+            while True:
+                rows = list(itertools.islice(reader, options['batch_size']))
+                if not rows:
+                    break
+                created = self.import_batch(rows, reader.line_num, executor)
+                imported += created
+                skipped += len(rows) - created
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d users, skipped %d!' % (imported, skipped)))
+
+    @staticmethod
+    def import_batch(rows, line_num, executor):
+        """Insert the users of rows whose email is free and return how
+        many"""
+        users = {}
+        for row in rows:
+            user = User.objects.build_user(
+                row['email'], password=row.get('password_hash') or None,
+                **{field: row[field] for field in FIELDS
+                   if row.get(field)})
+            if user.password and not is_valid_hash(user.password):
+                raise CommandError(
+                    'Invalid password_hash for %s, near line %d'
+                    % (user.email, line_num))
+            users.setdefault(user.email, (user, row.get('password') or None))
+
+        taken = set(User.objects.filter(
+            email__in=list(users)).values_list('email', flat=True))
+        batch = [users[email] for email in users if email not in taken]
+        unhashed = [(user, password) for user, password in batch
+                    if not user.password]
+        # The hashers release the GIL, so the threads hash in parallel
+        hashes = executor.map(
+            make_password, [password for _, password in unhashed])
+        for (user, _), encoded in zip(unhashed, hashes):
+            user.password = encoded
+        User.objects.bulk_create([user for user, _ in batch])
+        return len(batch)
@@ -0,0 +1,126 @@
+import datetime
+import gzip
+import os
+import time
+import zlib
+
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import ArchivedBatch, Candidate, CandidateTopic, \
+    Favorite, Vote
+
+MODELS = {
+    'vote': Vote,
+    'favorite': Favorite,
+    'candidatetopic': CandidateTopic,
+    'candidate': Candidate,
+}
+
+
+def archive_to_file(directory, queryset):
+    """Append the rows of queryset to the gzipped JSON lines file of their
+    model, in the format of dumpdata"""
+    path = os.path.join(
+        directory, '%s.jsonl.gz' % queryset.model._meta.label_lower)
+    # Every append adds a gzip member, which readers concatenate
+    with gzip.open(path, 'at') as archive:
+        serializers.serialize('jsonl', queryset.order_by('pk'),
+                              stream=archive)
+
+
+class Command(BaseCommand):
+    """Django command to hard delete the rows soft deleted more than --days
+    ago, optionally archiving them first
+
+    Rows go in batches of --batch-size, oldest id first, each batch in its
+    own transaction and followed by a --sleep pause, so an interrupted run
+    loses at most one batch and the next run carries on from there.
+    Purging a candidate also purges its topics, votes and favorites, live
+    or not. Archives are a table of gzipped batches, or one gzipped
+    JSON lines file per model that loaddata restores.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--models', nargs='+', choices=MODELS,
+                            default=list(MODELS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches')
+        parser.add_argument('--max-batches', type=int,
+                            help='Stop after this many batches')
+        parser.add_argument('--archive', choices=('table', 'file'))
+        parser.add_argument('--archive-dir',
+                            help='Directory of the archive files')
+
+    def handle(self, *args, **options):
+        archive = None
+        if options['archive'] == 'table':
+            archive = ArchivedBatch.archive
+        elif options['archive'] == 'file':
+            directory = options['archive_dir']
+            if not directory or not os.path.isdir(directory):
+                raise CommandError('--archive file needs an --archive-dir.')
+
+            def archive(queryset):
+                archive_to_file(directory, queryset)
+
+        lock = zlib.crc32(b'purge_deleted')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock])
+            if not cursor.fetchone()[0]:
+                raise CommandError('Another purge_deleted is running')
+        try:
+            self.purge(options, archive)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [lock])
+
+    def purge(self, options, archive):
+        """Purge the models in turn until done or out of batches"""
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        batch_size, batches = options['batch_size'], 0
+        for name in options['models']:
+            model, total = MODELS[name], 0
+            while options['max_batches'] is None or \
+                    batches < options['max_batches']:
+                purged = self.purge_batch(model, cutoff, batch_size, archive)
+                total += purged
+                if not purged:
+                    break
+                batches += 1
+                if purged < batch_size:
+                    break
+                time.sleep(options['sleep'])
+            self.stdout.write('Purged %d %s' % (
+                total, model._meta.verbose_name_plural))
+
+        self.stdout.write(self.style.SUCCESS('Purge complete!'))
+
+    @staticmethod
+    def purge_batch(model, cutoff, batch_size, archive):
+        """Purge, and archive, the first batch_size rows of model deleted
+        before cutoff and return how many"""
+        with transaction.atomic():
+            # Skips the rows a concurrent undelete holds
+            ids = list(model.objects.deleted_only().filter(
+                deleted__lt=cutoff).order_by('pk').select_for_update(
+                    skip_locked=True).values_list('pk', flat=True)[
+                        :batch_size])
+            if not ids:
+                return 0
+            batch = model.objects.all_with_deleted().filter(pk__in=ids)
+            if model is Candidate:
+                if archive is not None:
+                    for related in batch.related(ids):
+                        archive(related)
+                    archive(batch)
+                batch.purge()
+            else:
+                if archive is not None:
+                    archive(batch)
+                batch._raw_delete(batch.db)
+        return len(ids)
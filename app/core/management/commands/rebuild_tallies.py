@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.models import CandidateTally
+
+
+class Command(BaseCommand):
+    """Django command to recompute every candidate tally from the votes"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding candidate tallies...\n')
+        count = CandidateTally.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt %d candidate tallies!' % count))
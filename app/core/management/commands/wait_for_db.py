@@ -1,20 +1,39 @@
 import time
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until database is available"""
+    """Django command to pause execution until database is available
+
+    Connects and runs a query, retrying with exponential backoff until the
+    database answers or the timeout passes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before failing')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest pause between attempts')
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...\n')
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                break
+            except OperationalError as e:
+                if time.monotonic() + delay > deadline:
+                    raise CommandError('Database unavailable: %s' % e)
+                self.stdout.write(
+                    'Database unavailable, waiting %.1f seconds...' % delay)
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,439 @@
+import asyncio
+import bisect
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, JsonResponse
+
+from core.routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+def normalize_sql(sql):
+    """Return sql with IN lists collapsed, so repeated lookups compare equal
+    whatever the number of parameters"""
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """Execute wrapper counting and timing the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, None)
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if duration > self.slowest[0]:
+            self.slowest = (duration, sql)
+        self.statements[normalize_sql(sql)] += 1
+
+    def repeated(self, threshold):
+        """Return the statement run the most if it ran threshold times"""
+        if not self.statements:
+            return None
+        sql, count = self.statements.most_common(1)[0]
+        return (sql, count) if count >= threshold else None
+
+
+class ViewStats:
+    """Histograms of the requests of one view"""
+
+    def __init__(self):
+        self.requests = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.db_ms = 0.0
+        self.view_ms = 0.0
+        self.render_ms = 0.0
+        self.n_plus_one = 0
+        self.slowest_sql = (0.0, None)
+
+    def add(self, timing, recorder, repeated):
+        self.requests += 1
+        self.latency[bisect.bisect_left(
+            LATENCY_BUCKETS, timing['total'])] += 1
+        self.queries[bisect.bisect_left(QUERY_BUCKETS, recorder.count)] += 1
+        self.db_ms += timing['db']
+        self.view_ms += timing['view']
+        self.render_ms += timing['render']
+        self.n_plus_one += repeated is not None
+        if recorder.slowest[0] * 1000 > self.slowest_sql[0]:
+            self.slowest_sql = (recorder.slowest[0] * 1000,
+                                recorder.slowest[1])
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'latency_ms': dict(zip(
+                [str(b) for b in LATENCY_BUCKETS] + ['+Inf'], self.latency)),
+            'queries': dict(zip(
+                [str(b) for b in QUERY_BUCKETS] + ['+Inf'], self.queries)),
+            'db_ms_avg': self.db_ms / self.requests,
+            'view_ms_avg': self.view_ms / self.requests,
+            'render_ms_avg': self.render_ms / self.requests,
+            'n_plus_one': self.n_plus_one,
+            'slowest_sql_ms': self.slowest_sql[0],
+            'slowest_sql': self.slowest_sql[1],
+        }
+
+
+class RequestStats:
+    """Per view statistics collected by this process"""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def add(self, view_name, timing, recorder, repeated):
+        with self._lock:
+            self._views.setdefault(view_name, ViewStats()).add(
+                timing, recorder, repeated)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: stats.as_dict()
+                    for name, stats in sorted(self._views.items())}
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+request_stats = RequestStats()
+
+
+def record_query(sql, duration):
+    """Count a query run outside the Django connections, like on the async
+    pool, in the statistics of the current request"""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.record(sql, duration)
+
+
+def _forward_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def forward_queries(connection, **kwargs):
+    """Record the queries of connection in the current request's statistics
+
+    Connected to connection_created, so the connections of the threads
+    running sync views under ASGI are recorded too.
+    """
+    if _forward_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_forward_query)
+
+
+connection_created.connect(forward_queries)
+
+
+class AsyncCapableMiddleware:
+    """Base of middleware that runs on the event loop under ASGI
+
+    Synchronous middleware would hold a thread for the whole request, even
+    while an async view awaits the database. Subclasses dispatch to
+    ``__acall__`` when ``is_async``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Makes the handler await us, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+class QueryStatsMiddleware(AsyncCapableMiddleware):
+    """Record the SQL queries and timings of every request
+
+    Adds a ``Server-Timing`` header splitting the request into database
+    time, view time outside the database (mostly serializers for the API
+    views) and response rendering, aggregates them per view in
+    ``request_stats`` and logs requests repeating one statement at least
+    ``QUERY_STATS_N_PLUS_ONE_THRESHOLD`` times.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.threshold = getattr(
+            settings, 'QUERY_STATS_N_PLUS_ONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for connection in connections.all():
+            forward_queries(connection)
+        recorder, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    @staticmethod
+    def start(request):
+        recorder = QueryRecorder()
+        request._stats_view_started = request._stats_view_finished = None
+        return recorder, _recorder.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        finished = time.perf_counter()
+
+        view_started = request._stats_view_started or started
+        view_finished = request._stats_view_finished or finished
+        timing = {
+            'total': (finished - started) * 1000,
+            'db': recorder.duration * 1000,
+            'render': (finished - view_finished) * 1000,
+        }
+        timing['view'] = max(
+            (view_finished - view_started) * 1000 - timing['db'], 0)
+
+        repeated = recorder.repeated(self.threshold)
+        if repeated is not None:
+            logger.warning('Possible N+1 queries in %s: %d x %s',
+                           request.path, repeated[1], repeated[0])
+
+        match = request.resolver_match
+        request_stats.add(match.view_name if match else 'unresolved',
+                          timing, recorder, repeated)
+
+        response['Server-Timing'] = ', '.join([
+            'db;dur=%.2f;desc="%d queries"' % (timing['db'], recorder.count),
+            'view;dur=%.2f' % timing['view'],
+            'render;dur=%.2f' % timing['render'],
+            'total;dur=%.2f' % timing['total'],
+        ])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._stats_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request._stats_view_finished = time.perf_counter()
+        return response
+
+
+class IdempotencyMiddleware(AsyncCapableMiddleware):
+    """Replay the response of a write retried with the same
+    ``Idempotency-Key`` header instead of running it again
+
+    The first request with a key stores a fingerprint of its method, path
+    and body under the key, scoped to the ``Authorization`` header, and
+    then its compressed response for ``IDEMPOTENCY_KEY_TTL`` seconds.
+    Retries get the stored response back with ``Idempotent-Replayed: true``.
+    A retry arriving while the first request still runs gets 409, and
+    reusing a key for a different request gets 422. Server errors are not
+    stored, so they can be retried.
+    """
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+    max_key_length = 255
+    # Bounds how long a crashed request blocks its key
+    lock_ttl = 60
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+        self.cache = caches[getattr(
+            settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if request.method not in self.methods or not key:
+            return self.get_response(request)
+
+        response, cache_key, fingerprint = self.start(request, key)
+        if response is not None:
+            return response
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.cache.delete(cache_key)
+            raise
+        self.store(cache_key, fingerprint, response)
+        return response
+
+    async def __acall__(self, request):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if request.method not in self.methods or not key:
+            return await self.get_response(request)
+
+        response, cache_key, fingerprint = await sync_to_async(
+            self.start)(request, key)
+        if response is not None:
+            return response
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(self.cache.delete)(cache_key)
+            raise
+        await sync_to_async(self.store)(cache_key, fingerprint, response)
+        return response
+
+    def start(self, request, key):
+        """Claim the key for request and return its cache key and
+        fingerprint, with the response to answer instead when the key was
+        already claimed"""
+        if len(key) > self.max_key_length:
+            return self.error(400, 'Idempotency-Key is too long.'), None, None
+
+        cache_key = self.get_cache_key(request, key)
+        fingerprint = self.get_fingerprint(request)
+        if self.cache.add(cache_key, (fingerprint, None), self.lock_ttl):
+            return None, cache_key, fingerprint
+
+        fingerprint_stored, stored = self.cache.get(
+            cache_key, (fingerprint, None))
+        if fingerprint_stored != fingerprint:
+            response = self.error(
+                422, 'Idempotency-Key was used for another request.')
+        elif stored is None:
+            response = self.error(
+                409, 'A request with this Idempotency-Key is running.')
+        else:
+            response = self.replay(stored)
+        return response, cache_key, fingerprint
+
+    def store(self, cache_key, fingerprint, response):
+        """Store the response of the request that claimed cache_key"""
+        if response.streaming or response.status_code >= 500:
+            self.cache.delete(cache_key)
+        else:
+            self.cache.set(cache_key, (fingerprint, (
+                response.status_code, list(response.items()),
+                zlib.compress(response.content))), self.ttl)
+
+    @staticmethod
+    def get_cache_key(request, key):
+        scope = '%s\n%s' % (request.META.get('HTTP_AUTHORIZATION', ''), key)
+        return 'idempotency:%s' % hashlib.sha256(
+            scope.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_fingerprint(request):
+        digest = hashlib.sha256(('%s %s\n' % (
+            request.method, request.get_full_path())).encode('utf-8'))
+        digest.update(request.body)
+        return digest.hexdigest()
+
+    @staticmethod
+    def replay(stored):
+        status, headers, content = stored
+        response = HttpResponse(zlib.decompress(content), status=status)
+        for header, value in headers:
+            response[header] = value
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def error(status, detail):
+        return JsonResponse({'detail': detail}, status=status)
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """Let safe requests read from the replicas, except right after the
+    same client wrote
+
+    A successful write pins its client to the primary for
+    ``REPLICA_MAX_LAG`` seconds, by token in the cache and by cookie for
+    session clients. Replicas lagging more than that are never read, so
+    clients always read their own writes.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    cookie_name = 'read_primary'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.window = getattr(settings, 'REPLICA_MAX_LAG', 5)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        allowed = request.method in self.safe_methods and \
+            not self.is_pinned(request)
+        with replica_reads(allowed):
+            response = self.get_response(request)
+
+        if request.method not in self.safe_methods and \
+                response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        allowed = request.method in self.safe_methods and \
+            not await sync_to_async(self.is_pinned)(request)
+        with replica_reads(allowed):
+            response = await self.get_response(request)
+
+        if request.method not in self.safe_methods and \
+                response.status_code < 400:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def is_pinned(self, request):
+        key = self.get_cache_key(request)
+        return self.cookie_name in request.COOKIES or bool(
+            key and caches['default'].get(key))
+
+    def pin(self, request, response):
+        key = self.get_cache_key(request)
+        if key:
+            caches['default'].set(key, True, self.window)
+        response.set_cookie(self.cookie_name, '1', max_age=self.window,
+                            httponly=True, samesite='Lax')
+
+    @staticmethod
+    def get_cache_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return 'replica-pin:%s' % hashlib.sha256(
+            authorization.encode('utf-8')).hexdigest()
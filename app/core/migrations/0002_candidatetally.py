@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:23
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+def backfill_tallies(apps, schema_editor):
+    Vote = apps.get_model('core', 'Vote')
+    CandidateTally = apps.get_model('core', 'CandidateTally')
+    counts = Vote.objects.filter(deleted__isnull=True).order_by().values(
+        'candidate_id').annotate(
+            up_count=Count('id', filter=Q(is_vote=True)),
+            down_count=Count('id', filter=Q(is_vote=False)))
+    CandidateTally.objects.bulk_create(
+        (CandidateTally(**row) for row in counts.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateTally',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tally', serialize=False, to='core.candidate')),
+                ('up_count', models.PositiveIntegerField(default=0)),
+                ('down_count', models.PositiveIntegerField(default=0)),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+            ],
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
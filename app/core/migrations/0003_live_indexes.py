@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_candidatetally'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['name', 'id'], name='candidate_name_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['user', 'name', 'id'], name='favorite_user_name_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['user', 'name', 'id'], name='vote_user_name_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['candidate', 'is_vote'], name='vote_candidate_live_idx'),
+        ),
+    ]
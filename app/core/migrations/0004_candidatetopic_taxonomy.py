@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:36
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_taxonomy(apps, schema_editor):
+    """Copy the sub-category and category of every candidate topic"""
+    CandidateTopic = apps.get_model('core', 'CandidateTopic')
+    Topic = apps.get_model('core', 'Topic')
+    topics = Topic.objects.filter(pk=OuterRef('topic_id'))
+    CandidateTopic.objects.update(
+        sub_category_id=Subquery(topics.values('sub_category_id')[:1]),
+        category_id=Subquery(
+            topics.values('sub_category__category_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_live_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatetopic',
+            name='category',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.category'),
+        ),
+        migrations.AddField(
+            model_name='candidatetopic',
+            name='sub_category',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.subcategory'),
+        ),
+        migrations.AlterField(
+            model_name='candidatetopic',
+            name='topic',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.topic'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatetopic',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['topic', 'candidate'], name='ctopic_topic_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatetopic',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['sub_category', 'candidate'], name='ctopic_sub_category_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatetopic',
+            index=models.Index(condition=models.Q(('deleted__isnull', True)), fields=['category', 'candidate'], name='ctopic_category_live_idx'),
+        ),
+        migrations.RunPython(backfill_taxonomy, migrations.RunPython.noop),
+    ]
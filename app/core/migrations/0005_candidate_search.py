@@ -0,0 +1,69 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:42
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION core_candidate_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_candidate_search_vector
+BEFORE INSERT OR UPDATE OF name, description ON core_candidate
+FOR EACH ROW EXECUTE FUNCTION core_candidate_search_vector();
+
+UPDATE core_candidate SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER core_candidate_search_vector ON core_candidate;
+DROP FUNCTION core_candidate_search_vector();
+"""
+
+# Typo tolerant search needs pg_trgm, which some hosted databases only let
+# superusers install, so it is enabled where possible and skipped otherwise
+TRIGRAM_INDEX = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions
+               WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX candidate_name_trgm_live_idx ON core_candidate
+            USING gin (name gin_trgm_ops) WHERE deleted IS NULL;
+    END IF;
+EXCEPTION WHEN insufficient_privilege THEN
+    RAISE NOTICE 'pg_trgm is not available, typo tolerant search is off';
+END
+$$;
+"""
+
+DROP_TRIGRAM_INDEX = """
+DROP INDEX IF EXISTS candidate_name_trgm_live_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_candidatetopic_taxonomy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('deleted__isnull', True)), fields=['search_vector'], name='candidate_search_live_idx'),
+        ),
+        migrations.RunSQL(TRIGRAM_INDEX, DROP_TRIGRAM_INDEX),
+    ]
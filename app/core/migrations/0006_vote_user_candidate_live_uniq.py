@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:45
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+
+def delete_duplicate_votes(apps, schema_editor):
+    """Soft delete every live vote but the latest of a user and candidate,
+    and recount the tallies"""
+    Vote = apps.get_model('core', 'Vote')
+    CandidateTally = apps.get_model('core', 'CandidateTally')
+    live = Vote.objects.filter(deleted__isnull=True)
+    newer = live.filter(user_id=OuterRef('user_id'),
+                        candidate_id=OuterRef('candidate_id'),
+                        id__gt=OuterRef('id'))
+    if not live.filter(Exists(newer)).update(deleted=timezone.now()):
+        return
+
+    counts = live.order_by().values('candidate_id').annotate(
+        up_count=Count('id', filter=Q(is_vote=True)),
+        down_count=Count('id', filter=Q(is_vote=False)))
+    CandidateTally.objects.all().delete()
+    CandidateTally.objects.bulk_create(
+        (CandidateTally(**row) for row in counts.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_candidate_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_votes,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted__isnull', True)), fields=('user', 'candidate'), name='vote_user_candidate_live_uniq'),
+        ),
+    ]
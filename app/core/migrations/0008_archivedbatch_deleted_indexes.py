@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:14
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_queuedvote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('rows', models.PositiveIntegerField()),
+                ('archived', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='archived')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='candidate_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatetopic',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='ctopic_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='favorite_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['deleted'], name='vote_deleted_idx'),
+        ),
+    ]
@@ -1,14 +1,24 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
+from django.core import serializers
 from django.utils.translation import gettext as _
 from model_utils.fields import AutoCreatedField, AutoLastModifiedField
 import datetime
+import gzip
+from collections import Counter
+from django.utils import timezone
 from safedelete.models import SafeDeleteModel
 from safedelete.managers import SafeDeleteManager
+from safedelete.queryset import SafeDeleteQueryset
 from safedelete import DELETED_INVISIBLE
 from safedelete.models import SOFT_DELETE, HARD_DELETE
+from core.cache import candidate_generation, filter_generation, \
+    location_generation, taxonomy_generation
 
 
 class MyModelManager(SafeDeleteManager):
@@ -37,12 +47,36 @@ class BaseModel(SafeDeleteModel):
             super().delete(force_policy, **kwargs)
 
 
+class VersionedModel(BaseModel):
+    """An abstract base class model that bumps ``generation`` whenever a
+    row is saved, soft deleted, undeleted or hard deleted, invalidating
+    the caches built from the model.
+
+    """
+    generation = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.generation.changed()
+
+    def hard_delete_policy_action(self, **kwargs):
+        super().hard_delete_policy_action(**kwargs)
+        self.generation.changed()
+
+
 class UserManager(BaseUserManager):
-    def create_user(self, email, password=None, **extra_fields):
-        """Creates and saves a new user"""
+    def build_user(self, email, **extra_fields):
+        """Returns a new unsaved user, without hashing any password"""
         if not email:
             raise ValueError('Users must have an email address')
-        user = self.model(email=self.normalize_email(email), **extra_fields)
+        return self.model(email=self.normalize_email(email), **extra_fields)
+
+    def create_user(self, email, password=None, **extra_fields):
+        """Creates and saves a new user"""
+        user = self.build_user(email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
@@ -56,16 +90,18 @@ class UserManager(BaseUserManager):
         return user
 
 
-class Country(BaseModel):
+class Country(VersionedModel):
     """List of country"""
+    generation = location_generation
     name = models.CharField(max_length=255)
 
     def __str__(self):
         return 'Country: %s' % (self.name)
 
 
-class State(BaseModel):
+class State(VersionedModel):
     """List of state"""
+    generation = location_generation
     name = models.CharField(max_length=255)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
 
@@ -73,8 +109,9 @@ class State(BaseModel):
         return 'State: %s' % (self.name)
 
 
-class City(BaseModel):
+class City(VersionedModel):
     """List of city"""
+    generation = location_generation
     name = models.CharField(max_length=255)
     state = models.ForeignKey(State, on_delete=models.CASCADE)
 
@@ -82,31 +119,55 @@ class City(BaseModel):
         return 'City: %s' % (self.name)
 
 
-class Category(BaseModel):
+class Category(VersionedModel):
     """List of category"""
+    generation = taxonomy_generation
     name = models.CharField(max_length=255)
 
     def __str__(self):
         return 'Category: %s' % (self.name)
 
 
-class SubCategory(BaseModel):
+class SubCategory(VersionedModel):
     """List of sub-category"""
+    generation = taxonomy_generation
     name = models.CharField(max_length=255)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
 
     def __str__(self):
         return 'Sub-Category: %s' % (self.name)
 
+    def save(self, *args, **kwargs):
+        """Save the sub-category and move its candidate topics along"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CandidateTopic.all_objects.filter(sub_category=self).exclude(
+                category_id=self.category_id).update(
+                    category_id=self.category_id)
+
 
-class Topic(BaseModel):
+class Topic(VersionedModel):
     """List of topic"""
+    generation = taxonomy_generation
     name = models.CharField(max_length=255)
     sub_category = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
 
     def __str__(self):
         return 'Topic: %s' % (self.name)
 
+    def save(self, *args, **kwargs):
+        """Save the topic and move its candidate topics along"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            category_id = SubCategory.all_objects.filter(
+                pk=self.sub_category_id).values_list(
+                    'category_id', flat=True).get()
+            CandidateTopic.all_objects.filter(topic=self).exclude(
+                sub_category_id=self.sub_category_id,
+                category_id=category_id).update(
+                    sub_category_id=self.sub_category_id,
+                    category_id=category_id)
+
 
 class User(BaseModel, AbstractBaseUser, PermissionsMixin):
     """Custom user model that supports using email instead of username"""
@@ -123,7 +184,7 @@ class User(BaseModel, AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Filter(BaseModel):
+class Filter(VersionedModel):
     """Filter"""
     name = models.CharField(max_length=255)
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
@@ -133,27 +194,264 @@ class Filter(BaseModel):
     def __str__(self):
         return 'Filter: %s' % (self.name)
 
+    @property
+    def generation(self):
+        return filter_generation(self.user_id)
+
 
-class Candidate(BaseModel):
-    """Candidate of the voters"""
+class CandidateQuerySet(SafeDeleteQueryset):
+    """Candidates, with batch soft delete, undelete and purge
+
+    Each runs a fixed number of statements however many candidates it
+    changes, instead of saving or deleting them one by one. Soft deleting
+    also soft deletes the live topics, votes and favorites of the
+    candidates at the same instant, which is how undeleting tells them
+    apart from the rows deleted on their own.
+
+    Queryset updates skip the visibility filter of safedelete, so they
+    filter on ``deleted`` themselves.
+    """
+    def related(self, candidate_ids):
+        """Return the topics, votes and favorites of the candidates, live
+        or deleted"""
+        return [model.all_objects.using(self.db).filter(
+                    candidate_id__in=candidate_ids)
+                for model in (CandidateTopic, Vote, Favorite)]
+
+    def soft_delete(self):
+        """Soft delete the live candidates, with their votes, favorites and
+        topics, and return how many"""
+        with transaction.atomic(using=self.db):
+            ids = list(self.filter(deleted__isnull=True).values_list(
+                'pk', flat=True))
+            if not ids:
+                return 0
+            # Waits for the drains saving them, so the votes they save are
+            # soft deleted below
+            QueuedVote.objects.using(self.db).filter(
+                candidate_id__in=ids).delete()
+            now = timezone.now()
+            for related in self.related(ids):
+                related.filter(deleted__isnull=True).update(
+                    deleted=now, modified=now)
+            CandidateTally.objects.using(self.db).filter(
+                candidate_id__in=ids).update(
+                    up_count=0, down_count=0, modified=now)
+            self.model.all_objects.using(self.db).filter(
+                pk__in=ids, deleted__isnull=True).update(
+                    deleted=now, modified=now)
+            self.model.generation.changed()
+        return len(ids)
+    soft_delete.alters_data = True
+
+    def undelete(self):
+        """Undelete the soft deleted candidates with the rows soft deleted
+        along with them, and return how many"""
+        with transaction.atomic(using=self.db):
+            ids = list(self.filter(deleted__isnull=False).values_list(
+                'pk', flat=True))
+            if not ids:
+                return 0
+            now = timezone.now()
+            deleted_together = Exists(self.model.all_objects.filter(
+                pk=OuterRef('candidate_id'), deleted=OuterRef('deleted')))
+            for related in self.related(ids):
+                related.filter(deleted_together).update(
+                    deleted=None, modified=now)
+            self.model.all_objects.using(self.db).filter(
+                pk__in=ids, deleted__isnull=False).update(
+                    deleted=None, modified=now)
+            CandidateTally.rebuild(candidate_ids=ids)
+            self.model.generation.changed()
+        return len(ids)
+    undelete.alters_data = True
+
+    def purge(self):
+        """Hard delete the candidates, with every row referencing them, and
+        return how many"""
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list('pk', flat=True))
+            if not ids:
+                return 0
+            # Nothing else references these rows, so skip the collector,
+            # which deletes candidates in batches of 100
+            for related in self.related(ids) + [
+                    QueuedVote.objects.filter(candidate_id__in=ids),
+                    CandidateTally.objects.filter(candidate_id__in=ids)]:
+                related._raw_delete(self.db)
+            candidates = self.model.all_objects.filter(pk__in=ids)
+            candidates._raw_delete(self.db)
+            self.model.generation.changed()
+        return len(ids)
+    purge.alters_data = True
+
+
+class Candidate(VersionedModel):
+    """Candidate of the voters
+
+    ``search_vector`` holds the weighted lexemes of the name and the
+    description. It is maintained by a database trigger, so bulk inserts
+    and queryset updates keep it current too.
+    """
+    generation = candidate_generation
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     city = models.ForeignKey(
         City, on_delete=models.SET_NULL, null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    objects = MyModelManager(CandidateQuerySet)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'],
+                         condition=Q(deleted__isnull=True),
+                         name='candidate_name_live_idx'),
+            GinIndex(fields=['search_vector'],
+                     condition=Q(deleted__isnull=True),
+                     name='candidate_search_live_idx'),
+            models.Index(fields=['deleted'],
+                         condition=Q(deleted__isnull=False),
+                         name='candidate_deleted_idx'),
+        ]
 
     def __str__(self):
         return 'Candidate: %s' % (self.name)
 
 
 class CandidateTopic(BaseModel):
-    """Candidate-Topic"""
+    """Candidate-Topic
+
+    ``sub_category`` and ``category`` are copied from the topic, and kept
+    in sync when the taxonomy changes, so candidates can be filtered by
+    any level of the taxonomy with a single indexed lookup.
+    """
     name = models.CharField(max_length=255)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
-    topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
+    # Looked up through the live indexes below, which lead with them
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE,
+                              db_index=False)
+    sub_category = models.ForeignKey(
+        SubCategory, on_delete=models.CASCADE, null=True, editable=False,
+        db_index=False)
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, editable=False,
+        db_index=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'candidate'],
+                         condition=Q(deleted__isnull=True),
+                         name='ctopic_topic_live_idx'),
+            models.Index(fields=['sub_category', 'candidate'],
+                         condition=Q(deleted__isnull=True),
+                         name='ctopic_sub_category_live_idx'),
+            models.Index(fields=['category', 'candidate'],
+                         condition=Q(deleted__isnull=True),
+                         name='ctopic_category_live_idx'),
+            models.Index(fields=['deleted'],
+                         condition=Q(deleted__isnull=False),
+                         name='ctopic_deleted_idx'),
+        ]
 
     def __str__(self):
         return 'Candidate-Topic: %s' % (self.name)
 
+    def save(self, *args, **kwargs):
+        """Save the candidate topic with the taxonomy of its topic"""
+        self.sub_category_id, self.category_id = Topic.all_objects.filter(
+            pk=self.topic_id).values_list(
+                'sub_category_id', 'sub_category__category_id').get()
+        super().save(*args, **kwargs)
+
+
+class CandidateTally(models.Model):
+    """Running up/down vote counts of a candidate"""
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE,
+                                     primary_key=True, related_name='tally')
+    up_count = models.PositiveIntegerField(default=0)
+    down_count = models.PositiveIntegerField(default=0)
+    modified = AutoLastModifiedField(_('modified'))
+
+    def __str__(self):
+        return 'Candidate-Tally: %s' % (self.candidate_id)
+
+    @classmethod
+    def record(cls, candidate_id, is_vote, delta):
+        """Add delta to the up or down count of the candidate"""
+        cls.record_counts({(candidate_id, is_vote): delta})
+
+    @classmethod
+    def rebuild(cls, batch_size=1000, candidate_ids=None):
+        """Recompute the tallies from the live votes, only those of
+        candidate_ids if given, and return the count"""
+        votes = Vote.objects.order_by()
+        tallies = cls.objects.all()
+        if candidate_ids is not None:
+            votes = votes.filter(candidate_id__in=candidate_ids)
+            tallies = tallies.filter(candidate_id__in=candidate_ids)
+        counts = votes.values('candidate_id').annotate(
+            up_count=Count('id', filter=Q(is_vote=True)),
+            down_count=Count('id', filter=Q(is_vote=False)),
+        )
+        with transaction.atomic():
+            tallies.delete()
+            tallies = cls.objects.bulk_create(
+                (cls(**row) for row in counts.iterator()),
+                batch_size=batch_size,
+            )
+        return len(tallies)
+
+    @classmethod
+    def record_counts(cls, counts):
+        """Add the deltas of a Counter keyed by (candidate_id, is_vote)
+
+        Every tally is changed by a single statement, updating the tallies
+        that exist and inserting the missing ones. Postgres checks the
+        counts of a row proposed by ``INSERT ... ON CONFLICT`` before
+        finding the conflict, so negative deltas can only be added by an
+        ``UPDATE``.
+        """
+        deltas = {}
+        for (candidate_id, is_vote), delta in counts.items():
+            if delta:
+                up, down = deltas.get(candidate_id, (0, 0))
+                deltas[candidate_id] = \
+                    (up + delta, down) if is_vote else (up, down + delta)
+        if not deltas:
+            return
+
+        connection = connections[router.db_for_write(cls)]
+        quote = connection.ops.quote_name
+        now = timezone.now()
+        rows, params = [], []
+        for candidate_id, (up, down) in sorted(deltas.items()):
+            rows.append('(%s, %s, %s, %s)')
+            params.extend((candidate_id, up, down, now))
+
+        sql = (
+            'WITH deltas (candidate, up, down, modified) AS (VALUES {rows}), '
+            'updated AS (UPDATE {table} SET {up} = {table}.{up} + deltas.up, '
+            '{down} = {table}.{down} + deltas.down, '
+            '{modified} = deltas.modified FROM deltas '
+            'WHERE {table}.{candidate} = deltas.candidate '
+            'RETURNING {table}.{candidate}) '
+            'INSERT INTO {table} ({candidate}, {up}, {down}, {modified}) '
+            'SELECT * FROM deltas '
+            'WHERE candidate NOT IN (SELECT {candidate} FROM updated) '
+            'ON CONFLICT ({candidate}) DO UPDATE SET '
+            '{up} = {table}.{up} + EXCLUDED.{up}, '
+            '{down} = {table}.{down} + EXCLUDED.{down}, '
+            '{modified} = EXCLUDED.{modified}'
+        ).format(
+            table=quote(cls._meta.db_table), rows=', '.join(rows),
+            **{name: quote(cls._meta.get_field(field).column)
+               for name, field in (('candidate', 'candidate'),
+                                   ('up', 'up_count'),
+                                   ('down', 'down_count'),
+                                   ('modified', 'modified'))})
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
 
 class Vote(BaseModel):
     """Vote of the voters"""
@@ -163,9 +461,190 @@ class Vote(BaseModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         condition=Q(deleted__isnull=True),
+                         name='vote_user_name_live_idx'),
+            models.Index(fields=['candidate', 'is_vote'],
+                         condition=Q(deleted__isnull=True),
+                         name='vote_candidate_live_idx'),
+            models.Index(fields=['deleted'],
+                         condition=Q(deleted__isnull=False),
+                         name='vote_deleted_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'candidate'],
+                                    condition=Q(deleted__isnull=True),
+                                    name='vote_user_candidate_live_uniq'),
+        ]
+
     def __str__(self):
         return 'Vote: %s' % (self.name)
 
+    @classmethod
+    def upsert(cls, votes):
+        """Save unsaved votes, replacing the live vote of the same user and
+        candidate, and return the saved votes
+
+        Every vote is one ``INSERT ... ON CONFLICT DO UPDATE`` row, so
+        concurrent and retried votes never duplicate. A conflicting vote is
+        only updated when it flips ``is_vote``, which makes every returned
+        update a flip and lets the tallies follow without reading the old
+        rows. Later votes of the same user and candidate win.
+        """
+        votes = list({(vote.user_id, vote.candidate_id): vote
+                      for vote in votes}.values())
+        if not votes:
+            return votes
+
+        alias = router.db_for_write(cls)
+        connection = connections[alias]
+        fields = [field for field in cls._meta.concrete_fields
+                  if not field.primary_key]
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        rows, params = [], []
+        for vote in votes:
+            rows.append('(%s)' % ', '.join(['%s'] * len(fields)))
+            params.extend(field.get_db_prep_save(
+                field.pre_save(vote, True), connection) for field in fields)
+
+        sql = (
+            'INSERT INTO {table} ({columns}) VALUES {rows} '
+            'ON CONFLICT ({user}, {candidate}) WHERE {deleted} IS NULL '
+            'DO UPDATE SET {is_vote} = EXCLUDED.{is_vote}, '
+            '{name} = EXCLUDED.{name}, {modified} = EXCLUDED.{modified} '
+            'WHERE {table}.{is_vote} <> EXCLUDED.{is_vote} '
+            'RETURNING {id}, {user}, {candidate}, {created}, xmax = 0'
+        ).format(
+            table=table, rows=', '.join(rows),
+            columns=', '.join(quote(field.column) for field in fields),
+            **{name: quote(cls._meta.get_field(name).column) for name in (
+                'id', 'user', 'candidate', 'deleted', 'is_vote', 'name',
+                'modified', 'created')})
+
+        by_key = {(vote.user_id, vote.candidate_id): vote for vote in votes}
+        counts = Counter()
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                saved = cursor.fetchall()
+            for id, user_id, candidate_id, created, inserted in saved:
+                vote = by_key.pop((user_id, candidate_id))
+                vote.id, vote.created = id, created
+                counts[candidate_id, vote.is_vote] += 1
+                if not inserted:
+                    counts[candidate_id, not vote.is_vote] -= 1
+            # Votes matching the live vote already were left untouched
+            if by_key:
+                keys = Q()
+                for user_id, candidate_id in by_key:
+                    keys |= Q(user_id=user_id, candidate_id=candidate_id)
+                for live in cls.objects.using(alias).filter(keys):
+                    vote = by_key.pop((live.user_id, live.candidate_id))
+                    vote.__dict__.update(
+                        {field.attname: getattr(live, field.attname)
+                         for field in cls._meta.concrete_fields})
+            CandidateTally.record_counts(counts)
+
+        for vote in votes:
+            vote._state.adding, vote._state.db = False, alias
+        return votes
+
+    def save(self, keep_deleted=False, **kwargs):
+        """Save the vote, moving it between tallies when it is created,
+        soft deleted, undeleted, flipped or given another candidate"""
+        counts = Counter()
+        with transaction.atomic():
+            if not self._state.adding:
+                # The tally of the stored row, which may differ from self
+                stored = type(self).all_objects.select_for_update().filter(
+                    pk=self.pk, deleted__isnull=True).values_list(
+                        'candidate_id', 'is_vote').first()
+                if stored is not None:
+                    counts[stored] -= 1
+            super().save(keep_deleted=keep_deleted, **kwargs)
+            if self.deleted is None:
+                counts[self.candidate_id, self.is_vote] += 1
+            CandidateTally.record_counts(counts)
+
+    def hard_delete_policy_action(self, **kwargs):
+        """Hard delete the vote, taking it out of the tally if still live"""
+        with transaction.atomic():
+            super().hard_delete_policy_action(**kwargs)
+            if self.deleted is None:
+                CandidateTally.record(self.candidate_id, self.is_vote, -1)
+
+
+class QueuedVote(models.Model):
+    """Vote accepted in write-behind mode and waiting to be saved
+
+    The queue is drained in id order, so the votes of a user are saved in
+    the order they were accepted. ``pending`` bounds the queued votes from
+    the table, so every process sees the drains of the others.
+    """
+    name = models.CharField(max_length=255)
+    is_vote = models.BooleanField()
+    candidate = models.ForeignKey(
+        Candidate, on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE, db_index=False)
+    created = AutoCreatedField(_('created'))
+
+    def __str__(self):
+        return 'Queued-Vote: %s' % (self.name)
+
+    @classmethod
+    def pending(cls):
+        """Return at least the number of queued votes
+
+        This is the span of the queued ids, read from both ends of the
+        primary key index instead of counting the rows. Votes are drained
+        oldest first, so the span only overshoots by the gaps left by
+        lagging partitions.
+        """
+        span = cls.objects.aggregate(first=Min('id'), last=Max('id'))
+        if span['first'] is None:
+            return 0
+        return span['last'] - span['first'] + 1
+
+    @classmethod
+    def enqueue(cls, votes):
+        """Queue unsaved votes and return the queued votes"""
+        queued = cls.objects.bulk_create([
+            cls(name=vote.name, is_vote=vote.is_vote,
+                candidate_id=vote.candidate_id, user_id=vote.user_id)
+            for vote in votes])
+        return queued
+
+    @classmethod
+    def drain(cls, batch_size=5000, partition=0, partitions=1):
+        """Save the oldest batch of queued votes of a partition of the users
+        and return the number of queued votes drained
+
+        Concurrent drains skip each other's rows, but only one worker per
+        partition keeps the votes of a user in order. Votes for candidates
+        deleted since they were queued are dropped.
+        """
+        queued = cls.objects.order_by('id')
+        if partitions > 1:
+            queued = queued.annotate(
+                partition=F('user_id') % partitions).filter(
+                    partition=partition)
+        with transaction.atomic():
+            batch = list(queued.select_for_update(
+                skip_locked=True, of=('self',))[:batch_size])
+            live = set(Candidate.objects.filter(
+                pk__in={item.candidate_id for item in batch}).values_list(
+                    'pk', flat=True))
+            Vote.upsert([Vote(name=item.name, is_vote=item.is_vote,
+                              candidate_id=item.candidate_id,
+                              user_id=item.user_id)
+                         for item in batch if item.candidate_id in live])
+            cls.objects.filter(id__in=[item.id for item in batch]).delete()
+        return len(batch)
+
 
 class Favorite(BaseModel):
     """Favorite candidates"""
@@ -174,5 +653,44 @@ class Favorite(BaseModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         condition=Q(deleted__isnull=True),
+                         name='favorite_user_name_live_idx'),
+            models.Index(fields=['deleted'],
+                         condition=Q(deleted__isnull=False),
+                         name='favorite_deleted_idx'),
+        ]
+
     def __str__(self):
         return 'Favorite: %s' % (self.name)
+
+
+class ArchivedBatch(models.Model):
+    """Batch of rows hard deleted by purge_deleted
+
+    ``data`` holds the rows as gzipped JSON lines in the format of
+    dumpdata, so loaddata restores them once decompressed to a file.
+    """
+    model_label = models.CharField(max_length=100)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    rows = models.PositiveIntegerField()
+    archived = AutoCreatedField(_('archived'))
+    data = models.BinaryField()
+
+    def __str__(self):
+        return 'Archived-Batch: %s %d-%d' % (
+            self.model_label, self.first_id, self.last_id)
+
+    @classmethod
+    def archive(cls, queryset):
+        """Store the rows of queryset in a new batch, if there are any"""
+        objects = list(queryset.order_by('pk'))
+        if objects:
+            cls.objects.create(
+                model_label=queryset.model._meta.label_lower,
+                first_id=objects[0].pk, last_id=objects[-1].pk,
+                rows=len(objects), data=gzip.compress(
+                    serializers.serialize('jsonl', objects).encode()))
@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+REPLICA_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Let the reads of the block go to a replica, or not"""
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads allowed by replica_reads to the replica aliases listed in
+    ``DATABASE_REPLICAS``, and everything else to the primary
+
+    Replicas lagging more than ``REPLICA_MAX_LAG`` seconds are skipped.
+    Lags are measured at most every ``REPLICA_LAG_CHECK_INTERVAL`` seconds
+    per process, and unreachable replicas count as infinitely late. Reads
+    routed from an event loop never wait for a measure: it runs in a
+    worker thread, and the last lag, or an infinite one, is used until it
+    is done.
+    Tokens are always read from the primary, so a token is usable as soon
+    as it is issued.
+    """
+    primary_app_labels = ('authtoken',)
+
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+        self.max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+        self.check_interval = getattr(
+            settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        self._lags = {}
+        self._lock = threading.Lock()
+        self._refreshing = {}
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not _replica_reads.get() or \
+                model._meta.app_label in self.primary_app_labels or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in self.replicas
+                    if self.lag(alias) <= self.max_lag]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in self.replicas
+
+    def lag(self, alias):
+        """Return the replication lag of alias in seconds"""
+        now = time.monotonic()
+        checked, lag = self._lags.get(alias, (None, None))
+        if checked is not None and now - checked < self.check_interval:
+            return lag
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            self.refresh_lag(loop, alias)
+            return float('inf') if lag is None else lag
+        with self._lock:
+            lag = self.measure_lag(alias)
+            self._lags[alias] = (now, lag)
+        return lag
+
+    def refresh_lag(self, loop, alias):
+        """Measure the lag of alias in a worker thread of loop, unless it
+        is being measured already"""
+        if alias in self._refreshing:
+            return
+
+        def refresh():
+            try:
+                self._lags[alias] = (time.monotonic(), self.measure_lag(alias))
+            finally:
+                # Leave no connection open in the shared worker thread
+                connections.close_all()
+
+        future = loop.run_in_executor(None, refresh)
+        self._refreshing[alias] = future
+        future.add_done_callback(
+            lambda future: self._refreshing.pop(alias, None))
+
+    @staticmethod
+    def measure_lag(alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return float('inf')
+        return float(lag or 0)
@@ -0,0 +1,57 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+
+ME_URL = reverse('app_user:me')
+ME_LOGOUT_URL = reverse('app_user:me-logout')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        authentication._tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234',
+            name='Test Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_cached_token_skips_database(self):
+        """Test that a resolved token is served from the cache"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_logout_invalidates_token(self):
+        """Test that a logged out token is no longer accepted"""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(ME_LOGOUT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_invalidates_user(self):
+        """Test that an updated user is not served stale from the cache"""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {'name': 'New Name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
@@ -0,0 +1,124 @@
+from unittest.mock import Mock, patch
+
+from django.db import connection, connections
+from django.db.utils import OperationalError, load_backend
+from django.test import SimpleTestCase, TestCase
+from psycopg2 import extensions
+
+from core.backends.pool import ConnectionPool, PoolTimeout
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_reuses_returned_connections(self):
+        """Test the most recently returned connection is reused"""
+        pool = ConnectionPool(max_size=2)
+        first = pool.get(Mock)
+        second = pool.get(Mock)
+        pool.put(first)
+        pool.put(second)
+
+        self.assertIs(pool.get(Mock), second)
+        self.assertEqual(pool.size, 2)
+
+    def test_waits_for_free_connection(self):
+        """Test get times out while max_size connections are in use"""
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.get(Mock)
+
+        with self.assertRaises(PoolTimeout):
+            pool.get(Mock)
+
+    def test_discards_connections(self):
+        """Test discarded connections are closed and free their slot"""
+        pool = ConnectionPool(max_size=1, timeout=0)
+        conn = pool.get(Mock)
+        pool.put(conn, discard=True)
+
+        conn.close.assert_called_once_with()
+        self.assertIsNot(pool.get(Mock), conn)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failing connect does not count towards max_size"""
+        pool = ConnectionPool(max_size=1, timeout=0)
+
+        with self.assertRaises(OperationalError):
+            pool.get(Mock(side_effect=OperationalError))
+        pool.get(Mock)
+
+    @patch('time.monotonic')
+    def test_closes_idle_connections(self, monotonic):
+        """Test connections idle past max_idle are closed down to
+        min_size"""
+        monotonic.return_value = 0
+        pool = ConnectionPool(min_size=1, max_size=3, max_idle=10)
+        conns = [pool.get(Mock) for _ in range(3)]
+        for conn in conns:
+            pool.put(conn)
+
+        monotonic.return_value = 20
+        self.assertIs(pool.get(Mock), conns[2])
+
+        conns[0].close.assert_called_once_with()
+        conns[1].close.assert_called_once_with()
+        conns[2].close.assert_not_called()
+        self.assertEqual(pool.size, 1)
+
+
+class DatabaseWrapperTests(TestCase):
+
+    def wrapper(self, **settings):
+        """Return a separate connection to the test database"""
+        settings_dict = dict(connection.settings_dict, **settings)
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+            settings_dict, 'pool_test')
+        # Registered for the connection_created receivers
+        connections['pool_test'] = wrapper
+        self.addCleanup(connections.__delitem__, 'pool_test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def request(self, wrapper):
+        """Query wrapper as a request would and return its backend PID"""
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        wrapper.close_if_unusable_or_obsolete()
+        return pid
+
+    def test_pooled_connection_reused(self):
+        """Test pooled connections are returned after each request and
+        reused by the next one"""
+        wrapper = self.wrapper(CONN_MAX_AGE=0, POOL={'MAX_SIZE': 1})
+        pool = wrapper.get_pool()
+        self.addCleanup(pool.close_idle)
+
+        self.assertEqual(self.request(wrapper), self.request(wrapper))
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(pool.idle, 1)
+
+    def test_pooled_connection_rolled_back(self):
+        """Test a connection returned mid-transaction is rolled back"""
+        wrapper = self.wrapper(CONN_MAX_AGE=0, POOL={'MAX_SIZE': 1})
+        self.addCleanup(wrapper.get_pool().close_idle)
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw = wrapper.connection
+
+        wrapper.close()
+
+        self.assertEqual(raw.info.transaction_status,
+                         extensions.TRANSACTION_STATUS_IDLE)
+        self.assertEqual(wrapper.get_pool().idle, 1)
+
+    def test_health_check_replaces_broken_connection(self):
+        """Test a persistent connection dropped by the server is replaced
+        before the next request uses it"""
+        wrapper = self.wrapper(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+        pid = self.request(wrapper)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        self.assertNotEqual(self.request(wrapper), pid)
@@ -1,23 +1,343 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.contrib.auth.hashers import make_password
+from django.core import serializers
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.models import ArchivedBatch, Candidate, CandidateTally, \
+    QueuedVote, Vote
+
+ENSURE_CONNECTION = \
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
 
 
 class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
+        with patch(ENSURE_CONNECTION) as ec:
+            call_command('wait_for_db', stdout=StringIO())
 
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(ec.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError]*5+[True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        """Test waiting for db backs off between attempts"""
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError]*5+[None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ec.call_count, 6)
+        self.assertEqual([call.args[0] for call in ts.call_args_list],
+                         [0.1, 0.2, 0.4, 0.8, 1.6])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test waiting for db fails once the timeout passes"""
+        with patch(ENSURE_CONNECTION, side_effect=OperationalError):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+        ts.assert_not_called()
+
+    def test_rebuild_tallies(self):
+        """Test rebuilding tallies recomputes the counts from live votes"""
+        candidate = Candidate.objects.create(name='Candidate 1')
+        for i, is_vote in enumerate((True, True, False)):
+            user = get_user_model().objects.create_user(
+                'test%d@example.com' % i, 'test1234')
+            Vote.objects.create(user=user, name='Vote %d' % i,
+                                is_vote=is_vote, candidate=candidate)
+        CandidateTally.objects.filter(candidate=candidate).update(
+            up_count=50, down_count=50)
+
+        call_command('rebuild_tallies', stdout=StringIO())
+
+        tally = CandidateTally.objects.get(candidate=candidate)
+        self.assertEqual(tally.up_count, 2)
+        self.assertEqual(tally.down_count, 1)
+
+    def test_drain_votes_keeps_user_order(self):
+        """Test draining saves the queued votes of a user in order"""
+        candidate = Candidate.objects.create(name='Candidate 1')
+        users = [get_user_model().objects.create_user(
+            'test%d@example.com' % i, 'test1234') for i in range(3)]
+        QueuedVote.enqueue([
+            Vote(user=user, candidate=candidate, name='Vote', is_vote=is_vote)
+            for is_vote in (True, False, True, False)
+            for user in users])
+
+        out = StringIO()
+        call_command('drain_votes', batch_size=2, partitions=2, partition=0,
+                     stdout=out)
+        call_command('drain_votes', batch_size=2, partitions=2, partition=1,
+                     stdout=out)
+
+        self.assertIn('Saved 4 queued votes', out.getvalue())
+        self.assertIn('Saved 8 queued votes', out.getvalue())
+        self.assertFalse(QueuedVote.objects.exists())
+        self.assertFalse(Vote.objects.filter(is_vote=True).exists())
+        tally = CandidateTally.objects.get(candidate=candidate)
+        self.assertEqual((tally.up_count, tally.down_count), (0, 3))
+
+    def test_check_votes(self):
+        """Test checking tallies reports and fixes differences"""
+        candidate = Candidate.objects.create(name='Candidate 1')
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        Vote.objects.create(
+            user=user, name='Vote 1', is_vote=True, candidate=candidate)
+        call_command('check_votes', stdout=StringIO())
+
+        CandidateTally.objects.update(up_count=5)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_votes', stdout=out)
+        self.assertIn('Candidate %d: tally (5, 0), votes (1, 0)'
+                      % candidate.id, out.getvalue())
+
+        call_command('check_votes', fix=True, stdout=StringIO())
+        self.assertEqual(CandidateTally.objects.get().up_count, 1)
+
+    def test_benchmark_indexes_discards_dataset(self):
+        """Test the index benchmark reports plans and rolls back its data"""
+        out = StringIO()
+        call_command('benchmark_indexes', users=2, candidates=5, votes=20,
+                     repeat=1, json=True, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report), {'before', 'after'})
+        self.assertIn('plan', report['before']['vote list'])
+        self.assertIn('p95', report['after']['vote list'])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_benchmark_search_discards_dataset(self):
+        """Test the search benchmark reports every search and rolls back"""
+        out = StringIO()
+        call_command('benchmark_search', candidates=20, repeat=1, json=True,
+                     stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertTrue(any(name.startswith('full-text') for name in report))
+        self.assertTrue(any(name.startswith('icontains') for name in report))
+        for result in report.values():
+            self.assertIn('p95', result)
+        self.assertFalse(Candidate.objects.exists())
+
+    def test_benchmark_reports_endpoints(self):
+        """Test the API benchmark reports every endpoint and rolls back"""
+        output = os.path.join(tempfile.mkdtemp(), 'report.json')
+        call_command('benchmark', countries=1, states=2, cities=3,
+                     categories=1, sub_categories=2, topics=3, users=3,
+                     candidates=3, votes=10, favorites=2, requests=2,
+                     output=output, stdout=StringIO())
+
+        with open(output) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['dataset']['votes'], 10)
+        for result in report['endpoints'].values():
+            self.assertLess(result['status'], 300)
+        self.assertFalse(Candidate.objects.exists())
+
+    def test_benchmark_connections_reports_modes(self):
+        """Test the connection benchmark reuses persistent connections"""
+        out = StringIO()
+        call_command('benchmark_connections', requests=3, json=True,
+                     stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['no persistence']['connections'], 3)
+        self.assertEqual(report['persistent']['connections'], 1)
+        self.assertEqual(report['pooled, health checks']['connections'], 1)
+
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=64)
+    def test_benchmark_auth_reports_hashers(self):
+        """Test the auth benchmark reports every hasher and rolls back"""
+        out = StringIO()
+        with patch('core.management.commands.benchmark_auth.HASHERS', {
+                'argon2': 'core.hashers.Argon2PasswordHasher',
+                'md5': 'django.contrib.auth.hashers.MD5PasswordHasher'}):
+            call_command('benchmark_auth', users=2, threads=2, json=True,
+                         stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report), {'argon2', 'md5'})
+        for result in report.values():
+            self.assertGreater(result['logins_per_sec'], 0)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class PurgeDeletedTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.candidates = [Candidate.objects.create(name='Candidate %d' % i)
+                           for i in range(3)]
+        self.votes = [Vote.objects.create(
+            name='Vote', is_vote=True, user=user, candidate=candidate)
+            for candidate in self.candidates]
+        for vote in self.votes:
+            vote.delete()
+        self.candidates[0].delete()
+        old = timezone.now() - datetime.timedelta(days=100)
+        Vote.objects.deleted_only().filter(
+            pk__in=[vote.pk for vote in self.votes[:2]]).update(deleted=old)
+        Candidate.objects.deleted_only().filter(
+            pk=self.candidates[0].pk).update(deleted=old)
+
+    def test_purges_rows_deleted_long_ago(self):
+        """Test only rows deleted more than --days ago are purged"""
+        out = StringIO()
+        call_command('purge_deleted', days=90, stdout=out)
+
+        self.assertEqual(
+            list(Vote.objects.all_with_deleted()), self.votes[2:])
+        self.assertEqual(
+            list(Candidate.objects.all_with_deleted().order_by('pk')),
+            self.candidates[1:])
+        self.assertIn('Purged 2 votes', out.getvalue())
+        self.assertIn('Purged 1 candidates', out.getvalue())
+
+    def test_purges_candidates_with_queued_votes(self):
+        """Test purged candidates take their queued votes with them"""
+        QueuedVote.enqueue([Vote(
+            name='Vote', is_vote=True, user=self.votes[0].user,
+            candidate=candidate) for candidate in self.candidates[:2]])
+
+        call_command('purge_deleted', models=['candidate'], days=90,
+                     stdout=StringIO())
+
+        self.assertFalse(Candidate.objects.all_with_deleted().filter(
+            pk=self.candidates[0].pk).exists())
+        self.assertEqual(
+            list(QueuedVote.objects.values_list('candidate_id', flat=True)),
+            [self.candidates[1].pk])
+
+    def test_batches_bounded_and_resumed(self):
+        """Test --max-batches stops a run that the next run finishes"""
+        call_command('purge_deleted', models=['vote'], batch_size=1,
+                     max_batches=1, stdout=StringIO())
+
+        self.assertEqual(Vote.objects.all_with_deleted().count(), 2)
+
+        call_command('purge_deleted', models=['vote'], batch_size=1,
+                     stdout=StringIO())
+
+        self.assertEqual(Vote.objects.all_with_deleted().count(), 1)
+
+    def test_archives_to_table(self):
+        """Test purged rows are archived in gzipped batches"""
+        call_command('purge_deleted', models=['vote'], archive='table',
+                     stdout=StringIO())
+
+        batch = ArchivedBatch.objects.get()
+        restored = [item.object for item in serializers.deserialize(
+            'jsonl', gzip.decompress(batch.data).decode())]
+        self.assertEqual(batch.rows, 2)
+        self.assertEqual(restored, self.votes[:2])
+
+    def test_archives_to_file(self):
+        """Test archive files restore with loaddata"""
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('purge_deleted', models=['candidate'],
+                         archive='file', archive_dir=directory,
+                         stdout=StringIO())
+            self.assertFalse(Vote.objects.all_with_deleted().filter(
+                candidate=self.candidates[0]).exists())
+
+            for name in ('core.candidate', 'core.vote'):
+                call_command('loaddata',
+                             os.path.join(directory, name + '.jsonl.gz'),
+                             verbosity=0)
+
+        self.assertTrue(Vote.objects.all_with_deleted().filter(
+            candidate=self.candidates[0]).exists())
+
+
+class ServerBenchmarkTests(TransactionTestCase):
+
+    def test_benchmark_asgi_reports_servers(self):
+        """Test the server benchmark loads both servers without errors"""
+        Candidate.objects.create(name='Candidate')
+        get_user_model().objects.create_user('test@example.com', 'test1234')
+        out = StringIO()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('benchmark_asgi', requests=4, concurrency=2,
+                         output=path, stdout=out)
+            with open(path) as report:
+                report = json.load(report)
+
+        self.assertEqual(set(report), {'wsgi', 'asgi'})
+        for results in report.values():
+            self.assertEqual(len(results), 4)
+            for result in results.values():
+                self.assertEqual(result['errors'], 0)
+        self.assertIn('asgi candidate tally', out.getvalue())
+
+
+class UserImportTests(TestCase):
+
+    def import_users(self, rows, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='') as csv_file:
+                csv.writer(csv_file).writerows(rows)
+            out = StringIO()
+            call_command('import_users', path, workers=2, stdout=out,
+                         **options)
+        return out.getvalue()
+
+    def test_import_hashes_and_skips_taken_emails(self):
+        """Test passwords are hashed and users already there are skipped"""
+        get_user_model().objects.create_user('taken@example.com', 'old1234')
+
+        out = self.import_users([
+            ('email', 'name', 'password'),
+            ('new1@EXAMPLE.com', 'New 1', 'test1234'),
+            ('new2@example.com', '', 'test5678'),
+            ('taken@example.com', 'Taken', 'test1234'),
+        ], batch_size=2)
+
+        self.assertIn('Imported 2 users, skipped 1', out)
+        user = get_user_model().objects.get(email='new1@example.com')
+        self.assertEqual(user.name, 'New 1')
+        self.assertTrue(user.check_password('test1234'))
+        self.assertTrue(get_user_model().objects.get(
+            email='taken@example.com').check_password('old1234'))
+
+    @override_settings(
+        PASSWORD_HASHERS=['core.hashers.Argon2PasswordHasher'],
+        ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=64)
+    def test_import_keeps_password_hashes(self):
+        """Test hashed passwords are stored as they are"""
+        encoded = make_password('test1234')
+
+        self.import_users([('email', 'password_hash'),
+                           ('test@example.com', encoded)])
+
+        user = get_user_model().objects.get()
+        self.assertEqual(user.password, encoded)
+        self.assertTrue(user.check_password('test1234'))
+
+    @override_settings(
+        PASSWORD_HASHERS=['core.hashers.Argon2PasswordHasher'],
+        ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=64)
+    def test_import_rejects_invalid_hashes(self):
+        """Test importing fails for hashes that cannot be verified"""
+        truncated = make_password('test1234').split(',')[0]
+        for encoded in ('test1234', truncated):
+            with self.assertRaises(CommandError):
+                self.import_users([('email', 'password_hash'),
+                                   ('test@example.com', encoded)])
+        self.assertFalse(get_user_model().objects.exists())
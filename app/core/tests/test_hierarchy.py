@@ -0,0 +1,137 @@
+import time
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from core import models
+from core.hierarchy import location_tree, taxonomy_tree
+
+
+class LocationTreeTests(TestCase):
+
+    def setUp(self):
+        self.malaysia = models.Country.objects.create(name='Malaysia')
+        self.singapore = models.Country.objects.create(name='Singapore')
+        self.selangor = models.State.objects.create(
+            name='Selangor', country=self.malaysia)
+        self.johor = models.State.objects.create(
+            name='Johor', country=self.malaysia)
+        self.shah_alam = models.City.objects.create(
+            name='Shah Alam', state=self.selangor)
+        self.klang = models.City.objects.create(
+            name='Klang', state=self.selangor)
+        self.muar = models.City.objects.create(
+            name='Muar', state=self.johor)
+
+    def test_resolve_city(self):
+        """Test resolving a city to its state and country"""
+        tree = location_tree()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tree.state_of(self.muar.id), self.johor.id)
+            self.assertEqual(tree.country_of(self.muar.id), self.malaysia.id)
+            self.assertIsNone(tree.state_of(0))
+            self.assertIsNone(tree.country_of(0))
+
+    def test_expand_country(self):
+        """Test expanding a country and a state to their cities"""
+        tree = location_tree()
+
+        self.assertEqual(
+            sorted(tree.cities_in_country(self.malaysia.id)),
+            sorted([self.shah_alam.id, self.klang.id, self.muar.id]))
+        self.assertEqual(tree.cities_in_country(self.singapore.id), ())
+        self.assertEqual(sorted(tree.cities_in_state(self.selangor.id)),
+                         sorted([self.shah_alam.id, self.klang.id]))
+
+    def test_tree_reused_until_locations_change(self):
+        """Test the tree is loaded once and reloaded after a change"""
+        tree = location_tree()
+
+        with self.assertNumQueries(0):
+            self.assertIs(location_tree(), tree)
+
+        self.muar.state = self.selangor
+        self.muar.save()
+        self.johor.delete()
+
+        tree = location_tree()
+        self.assertEqual(tree.state_of(self.muar.id), self.selangor.id)
+        self.assertEqual(tree.cities_in_state(self.johor.id), ())
+        self.assertNotIn(self.johor.id, tree.middles.ids)
+
+    def test_tree_reloaded_after_local_generation_expires(self):
+        """Test changes made by other processes are seen once the
+        generation in process memory expires"""
+        tree = location_tree()
+        # Another process bumps the generation in its own memory only
+        models.City.objects.filter(pk=self.muar.pk).update(
+            state=self.selangor)
+
+        self.assertIs(location_tree(), tree)
+        with patch('time.time', return_value=time.time() + 61):
+            tree = location_tree()
+
+        self.assertEqual(tree.state_of(self.muar.id), self.selangor.id)
+
+
+class TaxonomyTreeTests(TestCase):
+
+    def setUp(self):
+        self.politics = models.Category.objects.create(name='Politics')
+        self.economy = models.Category.objects.create(name='Economy')
+        self.elections = models.SubCategory.objects.create(
+            name='Elections', category=self.politics)
+        self.trade = models.SubCategory.objects.create(
+            name='Trade', category=self.economy)
+        self.turnout = models.Topic.objects.create(
+            name='Turnout', sub_category=self.elections)
+        self.tariffs = models.Topic.objects.create(
+            name='Tariffs', sub_category=self.trade)
+        self.candidate = models.Candidate.objects.create(name='Candidate')
+
+    def test_resolve_topic(self):
+        """Test resolving a topic to its sub-category and category"""
+        tree = taxonomy_tree()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tree.sub_category_of(self.turnout.id),
+                             self.elections.id)
+            self.assertEqual(tree.category_of(self.tariffs.id),
+                             self.economy.id)
+            self.assertEqual(tree.topics_in_category(self.politics.id),
+                             (self.turnout.id,))
+
+    def test_tree_reloaded_after_topic_change(self):
+        """Test the tree is reloaded after a topic moves"""
+        taxonomy_tree()
+        self.turnout.sub_category = self.trade
+        self.turnout.save()
+
+        tree = taxonomy_tree()
+        self.assertEqual(tree.category_of(self.turnout.id), self.economy.id)
+        self.assertEqual(tree.topics_in_sub_category(self.elections.id), ())
+
+    def test_candidate_topic_denormalized(self):
+        """Test candidate topics copy their topic's taxonomy"""
+        candidate_topic = models.CandidateTopic.objects.create(
+            name='Turnout', candidate=self.candidate, topic=self.turnout)
+
+        self.assertEqual(candidate_topic.sub_category, self.elections)
+        self.assertEqual(candidate_topic.category, self.politics)
+
+    def test_candidate_topic_follows_taxonomy(self):
+        """Test candidate topics follow topics and sub-categories moving"""
+        candidate_topic = models.CandidateTopic.objects.create(
+            name='Turnout', candidate=self.candidate, topic=self.turnout)
+
+        self.turnout.sub_category = self.trade
+        self.turnout.save()
+        candidate_topic.refresh_from_db()
+        self.assertEqual(candidate_topic.sub_category, self.trade)
+        self.assertEqual(candidate_topic.category, self.economy)
+
+        self.trade.category = self.politics
+        self.trade.save()
+        candidate_topic.refresh_from_db()
+        self.assertEqual(candidate_topic.category, self.politics)
@@ -0,0 +1,193 @@
+import json
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import IdempotencyMiddleware, QueryRecorder, \
+    normalize_sql, request_stats
+from core.models import Candidate, Favorite
+
+CANDIDATE_URL = reverse('app_vote:candidate-list')
+CREATE_USER_URL = reverse('app_user:create')
+FAVORITE_URL = reverse('app_vote:favorite-list')
+STATS_URL = reverse('stats')
+
+
+class QueryStatsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        request_stats.clear()
+        self.client = APIClient()
+
+    def test_server_timing_header(self):
+        """Test responses report their database and view timings"""
+        Candidate.objects.create(name='Candidate 1')
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(CANDIDATE_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('view;dur=', timing)
+        self.assertIn('render;dur=', timing)
+
+    def test_stats_requires_admin(self):
+        """Test the request statistics are only available to admins"""
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_aggregated_per_view(self):
+        """Test requests are aggregated in the view histograms"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'admin1234')
+        self.client.force_authenticate(admin)
+        self.client.get(CANDIDATE_URL)
+        self.client.get(CANDIDATE_URL)
+
+        res = self.client.get(STATS_URL)
+
+        stats = res.data['app_vote:candidate-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(sum(stats['latency_ms'].values()), 2)
+        self.assertEqual(stats['queries']['1'], 2)
+
+    def test_repeated_statements_detected(self):
+        """Test a statement repeated with different IN lists is flagged"""
+        recorder = QueryRecorder()
+        for size in range(1, 6):
+            sql = 'SELECT * FROM core_vote WHERE id IN (%s)' % ', '.join(
+                ['%s'] * size)
+            recorder(lambda *args: None, sql, [], False, {})
+
+        self.assertEqual(normalize_sql(sql),
+                         'SELECT * FROM core_vote WHERE id IN (...)')
+        self.assertEqual(recorder.count, 5)
+        self.assertEqual(recorder.repeated(5)[1], 5)
+        self.assertIsNone(recorder.repeated(6))
+
+
+class IdempotencyMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.payload = {'email': 'test@example.com', 'name': 'Test Name',
+                        'password': 'test1234',
+                        'password_confirmation': 'test1234'}
+
+    def create_user(self, key, **payload):
+        return self.client.post(
+            CREATE_USER_URL, json.dumps(dict(self.payload, **payload)),
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replayed(self):
+        """Test a retried write replays the response without running it"""
+        res = self.create_user('key-1')
+
+        with self.assertNumQueries(0):
+            retry = self.create_user('key-1')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.content, res.content)
+        self.assertEqual(retry['Content-Type'], res['Content-Type'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_without_key_not_replayed(self):
+        """Test writes without a key run every time"""
+        self.client.post(CREATE_USER_URL, self.payload, format='json')
+        res = self.client.post(CREATE_USER_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    def test_key_reused_for_other_request(self):
+        """Test a key cannot be reused for a different request"""
+        self.create_user('key-1')
+
+        res = self.create_user('key-1', email='other@example.com')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_keys_scoped_to_authorization(self):
+        """Test the same key sent by different users is not shared"""
+        candidate = Candidate.objects.create(name='Candidate')
+        payload = json.dumps({'name': 'Favorite', 'candidate': candidate.id})
+
+        for email in ('test1@example.com', 'test2@example.com'):
+            user = get_user_model().objects.create_user(email, 'test1234')
+            res = self.client.post(
+                FAVORITE_URL, payload, content_type='application/json',
+                HTTP_AUTHORIZATION='Token %s' % Token.objects.create(
+                    user=user).key,
+                HTTP_IDEMPOTENCY_KEY='key-1')
+            self.assertNotIn('Idempotent-Replayed', res)
+
+        self.assertEqual(Favorite.objects.count(), 2)
+
+    def test_running_request_conflicts(self):
+        """Test a retry while the first request runs is rejected"""
+        request = RequestFactory().post(
+            CREATE_USER_URL, json.dumps(self.payload),
+            content_type='application/json')
+        cache.add(IdempotencyMiddleware.get_cache_key(request, 'key-1'),
+                  (IdempotencyMiddleware.get_fingerprint(request), None))
+
+        res = self.create_user('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+
+    def test_concurrent_duplicates_run_once(self):
+        """Test duplicate submissions racing each other write once"""
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        token = Token.objects.create(user=user)
+        payload = json.dumps({
+            'name': 'Favorite',
+            'candidate': Candidate.objects.create(name='Candidate').id})
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def post():
+            try:
+                barrier.wait()
+                res = APIClient().post(
+                    FAVORITE_URL, payload, content_type='application/json',
+                    HTTP_AUTHORIZATION='Token %s' % token.key,
+                    HTTP_IDEMPOTENCY_KEY='key-1')
+                statuses.append(res.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.assertEqual(len(statuses), 8)
+        self.assertLessEqual(set(statuses), {201, 409})
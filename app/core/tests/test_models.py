@@ -1,4 +1,9 @@
-from django.test import TestCase
+import threading
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -46,6 +51,22 @@ class ModelTests(TestCase):
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
 
+    @override_settings(
+        PASSWORD_HASHERS=['core.hashers.Argon2PasswordHasher'],
+        ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=64, ARGON2_PARALLELISM=1)
+    def test_password_rehashed_with_new_argon2_costs(self):
+        """Test passwords hashed with old Argon2 costs upgrade at login"""
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test1234')
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertIn('m=64,t=1,p=1', user.password)
+
+        with self.settings(ARGON2_MEMORY_COST=128):
+            self.assertTrue(user.check_password('test1234'))
+
+        user.refresh_from_db()
+        self.assertIn('m=128,t=1,p=1', user.password)
+
     def test_candidate_str(self):
         """Test the candidate string representation"""
         candidate = models.Candidate.objects.create(
@@ -64,3 +85,259 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(vote), 'Vote: %s' % (vote.name))
+
+    def test_vote_updates_candidate_tally(self):
+        """Test creating, soft deleting and undeleting votes tallies them"""
+        user = sample_user()
+        candidate = sample_candidate()
+        vote = models.Vote.objects.create(
+            user=user, name='Vote 1', is_vote=True, candidate=candidate)
+        models.Vote.objects.create(
+            user=sample_user('other@example.com'), name='Vote 2',
+            is_vote=False, candidate=candidate)
+
+        tally = models.CandidateTally.objects.get(candidate=candidate)
+        self.assertEqual(tally.up_count, 1)
+        self.assertEqual(tally.down_count, 1)
+
+        vote.delete()
+        tally.refresh_from_db()
+        self.assertEqual(tally.up_count, 0)
+
+        vote.undelete()
+        tally.refresh_from_db()
+        self.assertEqual(tally.up_count, 1)
+
+        vote.delete()
+        vote.delete()
+        tally.refresh_from_db()
+        self.assertEqual(tally.up_count, 0)
+        self.assertEqual(tally.down_count, 1)
+
+    def test_vote_changes_move_tally(self):
+        """Test flipping a vote or moving it to another candidate moves
+        its count"""
+        candidate, other = sample_candidate(), sample_candidate()
+        vote = models.Vote.objects.create(
+            user=sample_user(), name='Vote 1', is_vote=True,
+            candidate=candidate)
+
+        def counts():
+            return list(models.CandidateTally.objects.order_by(
+                'pk').values_list('up_count', 'down_count'))
+
+        vote.is_vote = False
+        vote.save()
+        self.assertEqual(counts(), [(0, 1)])
+
+        vote.candidate = other
+        vote.save()
+        self.assertEqual(counts(), [(0, 0), (0, 1)])
+
+        vote.name = 'Vote 2'
+        vote.save()
+        self.assertEqual(counts(), [(0, 0), (0, 1)])
+
+    def test_vote_unique_per_user_and_candidate(self):
+        """Test a user has one live vote per candidate"""
+        user = sample_user()
+        candidate = sample_candidate()
+        vote = models.Vote.objects.create(
+            user=user, name='Vote 1', is_vote=True, candidate=candidate)
+        vote.delete()
+        models.Vote.objects.create(
+            user=user, name='Vote 2', is_vote=True, candidate=candidate)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Vote.objects.create(
+                user=user, name='Vote 3', is_vote=False, candidate=candidate)
+
+    def test_vote_upsert(self):
+        """Test upserting votes flips the live vote and its tally"""
+        user = sample_user()
+        candidate = sample_candidate()
+
+        def upsert(name, is_vote):
+            return models.Vote.upsert([models.Vote(
+                user=user, name=name, is_vote=is_vote,
+                candidate=candidate)])[0]
+
+        def counts():
+            tally = models.CandidateTally.objects.get(candidate=candidate)
+            return tally.up_count, tally.down_count
+
+        vote = upsert('Vote 1', True)
+        self.assertEqual(counts(), (1, 0))
+        self.assertEqual(upsert('Vote 2', True).id, vote.id)
+        self.assertEqual(counts(), (1, 0))
+        flipped = upsert('Vote 3', False)
+        self.assertEqual(counts(), (0, 1))
+
+        self.assertEqual(flipped.id, vote.id)
+        self.assertEqual(models.Vote.objects.get().name, 'Vote 3')
+        self.assertFalse(models.Vote.objects.get().is_vote)
+
+    def test_record_counts_in_one_query(self):
+        """Test tallies of many candidates change with one statement"""
+        counted, new = sample_candidate(), sample_candidate()
+        models.CandidateTally.objects.create(
+            candidate=counted, up_count=2, down_count=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            models.CandidateTally.record_counts(Counter({
+                (counted.id, True): -1, (counted.id, False): 3,
+                (new.id, True): 2, (new.id, False): 0}))
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            list(models.CandidateTally.objects.order_by('pk').values_list(
+                'up_count', 'down_count')), [(1, 4), (2, 0)])
+
+    def test_queued_votes_pending(self):
+        """Test the queue depth is read from the ends of the queued ids"""
+        user, candidate = sample_user(), sample_candidate()
+        queued = models.QueuedVote.enqueue([models.Vote(
+            user=user, candidate=candidate, name='Vote', is_vote=True)
+            for _ in range(3)])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(models.QueuedVote.pending(), 3)
+        queued[0].delete()
+        self.assertEqual(models.QueuedVote.pending(), 2)
+        models.QueuedVote.objects.all().delete()
+        self.assertEqual(models.QueuedVote.pending(), 0)
+
+    def test_drain_drops_votes_of_deleted_candidates(self):
+        """Test queued votes for deleted candidates are not saved"""
+        user = sample_user()
+        candidate, other = sample_candidate(), sample_candidate()
+        models.QueuedVote.enqueue([
+            models.Vote(user=user, candidate=each, name='Vote', is_vote=True)
+            for each in (candidate, other)])
+
+        candidate.delete()
+        models.Candidate.objects.filter(pk=other.pk).soft_delete()
+
+        self.assertFalse(models.QueuedVote.objects.filter(
+            candidate=other).exists())
+        self.assertEqual(models.QueuedVote.drain(), 1)
+        self.assertFalse(models.Vote.all_objects.exists())
+        self.assertFalse(models.CandidateTally.objects.filter(
+            up_count__gt=0).exists())
+
+
+class CandidateBatchTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.candidates = [sample_candidate(name='Candidate %d' % i)
+                           for i in range(4)]
+        topic = models.Topic.objects.create(
+            name='Topic', sub_category=models.SubCategory.objects.create(
+                name='Sub category', category=models.Category.objects.create(
+                    name='Category')))
+        for candidate in self.candidates:
+            models.Vote.objects.create(name='Vote', is_vote=True,
+                                       user=self.user, candidate=candidate)
+            models.Favorite.objects.create(name='Favorite', user=self.user,
+                                           candidate=candidate)
+            models.CandidateTopic.objects.create(
+                name='Topic', topic=topic, candidate=candidate)
+
+    def batch(self, candidates):
+        return models.Candidate.objects.all_with_deleted().filter(
+            pk__in=[candidate.pk for candidate in candidates])
+
+    def test_batches_run_fixed_number_of_queries(self):
+        """Test batch operations do not query per candidate"""
+        for operation in ('soft_delete', 'undelete', 'purge'):
+            counts = []
+            for candidates in (self.candidates[:1], self.candidates[1:]):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(
+                        getattr(self.batch(candidates), operation)(),
+                        len(candidates))
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], operation)
+
+    def test_soft_delete_cascades(self):
+        """Test soft deleting candidates soft deletes their rows and
+        zeroes their tallies"""
+        self.batch(self.candidates[:2]).soft_delete()
+
+        self.assertEqual(models.Candidate.objects.count(), 2)
+        self.assertEqual(models.Vote.objects.count(), 2)
+        self.assertEqual(models.Favorite.objects.count(), 2)
+        self.assertEqual(models.CandidateTopic.objects.count(), 2)
+        self.assertEqual(models.CandidateTally.objects.get(
+            candidate=self.candidates[0]).up_count, 0)
+
+    def test_undelete_restores_rows_deleted_together(self):
+        """Test undeleting keeps the rows deleted on their own deleted"""
+        candidate = self.candidates[0]
+        models.Favorite.objects.get(candidate=candidate).delete()
+        self.batch([candidate]).soft_delete()
+
+        self.assertEqual(self.batch([candidate]).undelete(), 1)
+
+        self.assertTrue(models.Vote.objects.filter(
+            candidate=candidate).exists())
+        self.assertFalse(models.Favorite.objects.filter(
+            candidate=candidate).exists())
+        self.assertEqual(models.CandidateTally.objects.get(
+            candidate=candidate).up_count, 1)
+
+    def test_purge_removes_related_rows(self):
+        """Test purging hard deletes candidates and every related row"""
+        candidate = self.candidates[0]
+        self.batch([candidate]).soft_delete()
+
+        self.assertEqual(models.Candidate.objects.deleted_only().purge(), 1)
+
+        self.assertFalse(models.Candidate.objects.all_with_deleted().filter(
+            pk=candidate.pk).exists())
+        self.assertEqual(models.Vote.objects.all_with_deleted().count(), 3)
+        self.assertFalse(models.CandidateTally.objects.filter(
+            candidate_id=candidate.pk).exists())
+
+    def test_purge_removes_queued_votes(self):
+        """Test purging candidates drops the votes queued for them"""
+        models.QueuedVote.enqueue([models.Vote(
+            name='Vote', is_vote=False, user=self.user, candidate=candidate)
+            for candidate in self.candidates[:2]])
+
+        self.assertEqual(self.batch(self.candidates[:1]).purge(), 1)
+
+        self.assertEqual(
+            list(models.QueuedVote.objects.values_list(
+                'candidate_id', flat=True)), [self.candidates[1].pk])
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+
+    def test_concurrent_upserts(self):
+        """Test racing upserts of one vote keep one vote and exact tallies"""
+        user = sample_user()
+        candidate = sample_candidate()
+        barrier = threading.Barrier(8)
+
+        def vote(is_vote):
+            try:
+                barrier.wait()
+                models.Vote.upsert([models.Vote(
+                    user=user, name='Vote', is_vote=is_vote,
+                    candidate=candidate)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(i % 2 == 0,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        vote = models.Vote.objects.get()
+        tally = models.CandidateTally.objects.get(candidate=candidate)
+        self.assertEqual((tally.up_count, tally.down_count),
+                         (1, 0) if vote.is_vote else (0, 1))
@@ -0,0 +1,147 @@
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, \
+    SynchronousOnlyOperation
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, \
+    override_settings
+from rest_framework.authtoken.models import Token
+
+from core.asyncdb import close_pools, fetch_values
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Candidate
+from core.routers import ReplicaRouter, replica_reads
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'],
+                   REPLICA_MAX_LAG=5)
+class ReplicaRouterTests(TransactionTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.lags = {'replica_0': 0.0, 'replica_1': 0.0}
+        patcher = patch.object(ReplicaRouter, 'measure_lag',
+                               side_effect=self.lags.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_primary_by_default(self):
+        """Test reads outside replica_reads go to the primary"""
+        self.assertEqual(self.router.db_for_read(Candidate), 'default')
+        self.assertEqual(self.router.db_for_write(Candidate), 'default')
+
+    def test_reads_replica_when_allowed(self):
+        """Test allowed reads go to a replica, but never writes"""
+        with replica_reads():
+            self.assertIn(self.router.db_for_read(Candidate),
+                          ('replica_0', 'replica_1'))
+            self.assertEqual(self.router.db_for_write(Candidate), 'default')
+            self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    def test_lagging_replicas_skipped(self):
+        """Test replicas lagging more than the maximum are not read"""
+        self.lags.update(replica_0=30.0, replica_1=float('inf'))
+
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Candidate), 'default')
+
+        self.lags['replica_1'] = 1.0
+        self.router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Candidate), 'replica_1')
+
+    def test_lag_measured_once_per_interval(self):
+        """Test the lag of a replica is cached between checks"""
+        with replica_reads():
+            for _ in range(3):
+                self.router.db_for_read(Candidate)
+
+        self.assertEqual(ReplicaRouter.measure_lag.call_count, 2)
+
+    def test_reads_primary_in_transaction(self):
+        """Test reads inside a transaction on the primary stay on it"""
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Candidate), 'default')
+
+    async def test_async_reads_measure_lag_off_loop(self):
+        """Test reads routed from the event loop measure lags in a worker
+        thread and use the primary until they are known"""
+        def measure_lag(alias):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return self.lags[alias]
+            raise SynchronousOnlyOperation(alias)
+        ReplicaRouter.measure_lag.side_effect = measure_lag
+        await sync_to_async(Candidate.objects.create)(name='Candidate')
+
+        with patch.object(router, 'routers', [self.router]), \
+                replica_reads():
+            try:
+                rows = await fetch_values(Candidate.objects.values('name'))
+            finally:
+                await close_pools()
+            await asyncio.gather(*self.router._refreshing.values())
+
+            self.assertEqual(rows, [{'name': 'Candidate'}])
+            self.assertIn(self.router.db_for_read(Candidate),
+                          ('replica_0', 'replica_1'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'], REPLICA_MAX_LAG=5)
+class ReplicaRoutingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.allowed = []
+        token = Token.objects.create(user=get_user_model().objects.create_user(
+            'test@example.com', 'test1234'))
+        self.authorization = 'Token %s' % token.key
+
+    def get_response(self, request):
+        from core.routers import _replica_reads
+        self.allowed.append(_replica_reads.get())
+        return HttpResponse(status=request.status)
+
+    def call(self, method, status=200, **extra):
+        request = getattr(self.factory, method)('/', **extra)
+        request.status = status
+        return ReplicaRoutingMiddleware(self.get_response)(request)
+
+    def test_not_used_without_replicas(self):
+        """Test the middleware is left out without replicas"""
+        with override_settings(DATABASE_REPLICAS=[]):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaRoutingMiddleware(self.get_response)
+
+    def test_safe_requests_read_replicas(self):
+        """Test only safe requests may read from replicas"""
+        self.call('get')
+        self.call('post', status=400)
+
+        self.assertEqual(self.allowed, [True, False])
+
+    def test_writes_pin_token_to_primary(self):
+        """Test a client reads from the primary after writing"""
+        self.call('post', status=201, HTTP_AUTHORIZATION=self.authorization)
+        self.call('get', HTTP_AUTHORIZATION=self.authorization)
+        self.call('get', HTTP_AUTHORIZATION='Token other')
+
+        self.assertEqual(self.allowed, [False, False, True])
+
+    def test_writes_pin_cookie_to_primary(self):
+        """Test session clients are pinned by cookie after writing"""
+        response = self.call('post', status=201)
+        cookie = response.cookies[ReplicaRoutingMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 5)
+
+        self.factory.cookies[cookie.key] = cookie.value
+        self.call('get')
+
+        self.assertEqual(self.allowed, [False, False])
@@ -0,0 +1,15 @@
+from rest_framework import permissions, views
+from rest_framework.response import Response
+
+from core.authentication import CachedTokenAuthentication
+from core.middleware import request_stats
+
+
+class RequestStatsView(views.APIView):
+    """Report the request statistics collected by this process"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        """Return the per view histograms"""
+        return Response(request_stats.as_dict())